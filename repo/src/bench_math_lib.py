@@ -0,0 +1,257 @@
+## @file bench_math_lib.py
+# @brief Benchmark and accuracy suite for math_lib.
+# @details Sweeps every function of math_lib over representative inputs and reports the time
+# per call, the maximal error against references from the standard math module and the number
+# of series iterations. The report is written as JSON; when a baseline report is given, the
+# script exits with status 1 if it does not exist or if any function got slower or less
+# accurate than the baseline allows. --save-baseline writes the baseline instead.
+#
+# Usage:
+#   python3 bench_math_lib.py [--output FILE] [--baseline FILE] [--save-baseline]
+#                             [--time-tolerance X] [--ulp-tolerance X] [--quick]
+# @date 2025-05-12
+
+import argparse
+import json
+import math
+import operator
+import os
+import random
+import sys
+import time
+
+import math_lib
+
+
+## @brief Class describing the benchmark of one math_lib function.
+class Case:
+
+    ## @brief Constructor for the Case class.
+    # @param name name of the math_lib function
+    # @param inputs list of argument tuples
+    # @param reference function computing the reference result, None to skip accuracy
+    # @param floor smallest magnitude used to scale errors; 1 measures absolute errors
+    # for functions bounded by 1, 0 measures relative errors
+    # @param cached True if math_lib caches the results of the function
+    def __init__(self, name, inputs, reference, floor=0.0, cached=False):
+        self.name = name
+        self.func = getattr(math_lib, name)
+        self.inputs = inputs
+        self.reference = reference
+        self.floor = floor
+        self.cached = cached
+
+    ## @brief Function to measure the time per call.
+    # @param repeat number of timed passes over the inputs, the fastest one is reported
+    # @return nanoseconds per call
+    def time_per_call(self, repeat):
+        func, inputs = self.func, self.inputs
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for args in inputs:
+                func(*args)
+            elapsed = time.perf_counter_ns() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best / len(inputs)
+
+    ## @brief Function to measure the error against the reference.
+    # @return tuple (maximal relative error, maximal error in units in the last place, worst input)
+    def errors(self):
+        max_rel = max_ulp = 0.0
+        worst = None
+        if self.reference is None:
+            return max_rel, max_ulp, worst
+        for args in self.inputs:
+            got = self.func(*args)
+            expected = self.reference(*args)
+            if isinstance(expected, str) or isinstance(got, str):
+                if isinstance(expected, str) != isinstance(got, str):
+                    return math.inf, math.inf, list(args)
+                continue
+            scale = max(abs(float(expected)), self.floor)
+            diff = abs(float(got) - float(expected))
+            rel = diff / scale if scale else diff
+            ulp = diff / math.ulp(scale) if scale else diff
+            if ulp > max_ulp:
+                max_rel, max_ulp, worst = rel, ulp, list(args)
+            max_rel = max(max_rel, rel)
+        return max_rel, max_ulp, worst
+
+    ## @brief Function to measure the mean number of series iterations per call.
+    # @return mean iteration count, None if the function is not instrumented
+    # @details The constant cache is cleared before every call of a cached function, so that
+    # the iterations of the computation are counted rather than those of a cache hit.
+    def iterations(self):
+        if self.name not in math_lib._INSTRUMENTED:
+            return None
+        math_lib.enable_stats()
+        try:
+            func = getattr(math_lib, self.name)
+            for args in self.inputs:
+                if self.cached:
+                    math_lib._constants.clear()
+                func(*args)
+            histogram = math_lib.get_stats()[self.name]['iterations']
+        finally:
+            math_lib.disable_stats()
+        calls = sum(histogram.values())
+        return sum(n * count for n, count in histogram.items()) / calls
+
+
+## @brief Function to build the benchmark cases.
+# @param count number of inputs per function
+# @return list of cases
+def build_cases(count):
+    rnd = random.Random(2025)
+
+    def uniform(lo, hi):
+        return [rnd.uniform(lo, hi) for _ in range(count)]
+
+    def log_uniform(lo_exp, hi_exp):
+        return [10 ** rnd.uniform(lo_exp, hi_exp) for _ in range(count)]
+
+    def pairs(xs, ys):
+        return list(zip(xs, ys))
+
+    def singles(xs):
+        return [(x,) for x in xs]
+
+    def sin_ref(x):
+        return math.sin(math.radians(math.fmod(x, 360)))
+
+    def cos_ref(x):
+        return math.cos(math.radians(math.fmod(x, 360)))
+
+    def div_ref(a, b):
+        return "Error" if b == 0 else a / b
+
+    def log_ref(a, b):
+        return "Error" if a <= 0 or b <= 0 or b == 1 else math.log(a, b)
+
+    def nthroot_ref(a, n):
+        return math.copysign(abs(a) ** (1 / n), a)
+
+    numbers = uniform(-1e6, 1e6)
+    degrees = uniform(-1e4, 1e4)
+    return [
+        Case('add', pairs(numbers, uniform(-1e6, 1e6)), operator.add),
+        Case('sub', pairs(numbers, uniform(-1e6, 1e6)), operator.sub),
+        Case('mul', pairs(numbers, uniform(-1e6, 1e6)), operator.mul),
+        Case('div', pairs(numbers, uniform(-1e6, 1e6)) + [(1, 0)], div_ref),
+        Case('fact', singles(rnd.randrange(171) for _ in range(count)), math.factorial),
+        Case('compute_e', [(20,)] * count, lambda precision: math.e, cached=True),
+        Case('arctan', singles(uniform(-0.9, 0.9)), math.atan),
+        Case('pi', [()] * count, lambda: math.pi, cached=True),
+        Case('square', singles(numbers), lambda a: a * a),
+        Case('power', pairs(uniform(0.1, 100), uniform(-5, 5)), math.pow),
+        Case('sqrt', singles(log_uniform(-10, 10)), math.sqrt),
+        Case('nthroot', pairs(uniform(-1e6, 1e6), [rnd.choice((3, 5, 7)) for _ in range(count)]),
+             nthroot_ref),
+        Case('ln', singles(log_uniform(-300, 300)), math.log),
+        Case('log', pairs(log_uniform(-300, 300), uniform(1.5, 20)), log_ref),
+        Case('abs', singles(numbers), abs),
+        Case('sin', singles(degrees), sin_ref, floor=1.0),
+        Case('cos', singles(degrees), cos_ref, floor=1.0),
+        Case('tg', singles(uniform(-89, 89)), lambda x: math.tan(math.radians(x))),
+        Case('cotg', singles(uniform(1, 179)), lambda x: 1 / math.tan(math.radians(x))),
+        Case('sum', [(numbers[:100],)] * max(1, count // 100), math.fsum),
+    ]
+
+
+## @brief Function to run the benchmark.
+# @param count number of inputs per function
+# @param repeat number of timed passes over the inputs
+# @return report as a dictionary keyed by function name
+def run(count, repeat):
+    report = {}
+    for case in build_cases(count):
+        max_rel, max_ulp, worst = case.errors()
+        report[case.name] = {
+            'ns_per_op': round(case.time_per_call(repeat), 1),
+            'max_rel_error': max_rel,
+            'max_ulp_error': max_ulp,
+            'worst_input': worst,
+            'iterations': case.iterations(),
+        }
+    return report
+
+
+## @brief Function to compare a report with a baseline report.
+# @param report current report
+# @param baseline baseline report
+# @param time_tolerance allowed slowdown factor
+# @param ulp_tolerance allowed growth of the maximal ULP error, in ULPs
+# @return list of regression messages, empty if there is none
+def compare(report, baseline, time_tolerance, ulp_tolerance):
+    regressions = []
+    for name, base in baseline.items():
+        cur = report.get(name)
+        if cur is None:
+            regressions.append(f"{name}: missing from the report")
+            continue
+        if cur['ns_per_op'] > base['ns_per_op'] * time_tolerance:
+            regressions.append(f"{name}: {cur['ns_per_op']} ns/op, baseline {base['ns_per_op']} ns/op")
+        if cur['max_ulp_error'] > base['max_ulp_error'] + ulp_tolerance:
+            regressions.append(f"{name}: max error {cur['max_ulp_error']:.3g} ULP, "
+                               f"baseline {base['max_ulp_error']:.3g} ULP")
+    return regressions
+
+
+## @brief Function to print the report as a table.
+# @param report report to print
+# @param file output stream
+def print_report(report, file=sys.stdout):
+    print(f"{'function':<10} {'ns/op':>10} {'max rel err':>12} {'max ULP':>10} {'iterations':>10}",
+          file=file)
+    for name, row in report.items():
+        iterations = '-' if row['iterations'] is None else f"{row['iterations']:.1f}"
+        print(f"{name:<10} {row['ns_per_op']:>10.1f} {row['max_rel_error']:>12.3g} "
+              f"{row['max_ulp_error']:>10.3g} {iterations:>10}", file=file)
+
+
+## @brief Main entry point of the benchmark.
+# @param argv command line arguments
+# @return exit status
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark and accuracy suite for math_lib.")
+    parser.add_argument('--output', default='../profiling/bench_math_lib.json',
+                        help="file to write the JSON report to")
+    parser.add_argument('--baseline', help="baseline JSON report to compare with")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="overwrite the baseline file with the report instead of comparing")
+    parser.add_argument('--time-tolerance', type=float, default=1.5,
+                        help="allowed slowdown factor against the baseline (default 1.5)")
+    parser.add_argument('--ulp-tolerance', type=float, default=2.0,
+                        help="allowed growth of the maximal error in ULPs (default 2)")
+    parser.add_argument('--quick', action='store_true', help="use fewer inputs and passes")
+    args = parser.parse_args(argv)
+
+    report = run(count=200 if args.quick else 2000, repeat=3 if args.quick else 7)
+    print_report(report)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.baseline is None:
+        return 0
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}.")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Baseline {args.baseline} not found, create it with --save-baseline.",
+              file=sys.stderr)
+        return 1
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.time_tolerance, args.ulp_tolerance)
+    for message in regressions:
+        print("REGRESSION " + message, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# end of bench_math_lib.py
@@ -2,45 +2,116 @@
 # @brief Calculator that evaluates mathematical expressions.
 # @date 2025-04-29
 
+import collections
+import contextvars
+import functools
+import operator
+import os
 import re
+import sys
+import time
+from math import lgamma, log2
 import math_lib as math
-import gui
+
+_TOKEN_SPEC = [
+    # log or nthroot with two arguments free of commas and parentheses
+    ('CALL',     r"(?P<func>log|nthroot|n√)\((?P<arg1>[^,()]+),(?P<arg2>[^,()]+)\)"),
+    ('NUMBER',   r"\d+(?:\.\d*|,\d+)?"),            # Integer or decimal, with a decimal comma
+    ('NAME',     r"n√|[a-zA-Z_π]\w*|√"),            # Identifiers (sin, cos, ANS, etc.)
+    ('OP',       r"\*\*|[+\-*/^()\[\]]|(?<!\d),|,(?!\d)"), # Operators, brackets, comma
+    ('SKIP',     r"[ \t]+"),                        # Skip whitespace
+    ('MISMATCH', r".")                              # Any other character = error
+]
+
+## @var _TOKEN_RE
+# master regular expression of the lexer
+_TOKEN_RE = re.compile("|".join(f"(?P<{n}>{p})" for n, p in _TOKEN_SPEC))
+
+## @brief Function to convert the digits of a number literal to decimal.
+# @param digits run of digits
+# @param base base of the literal
+# @return decimal digits, or digits unchanged if they are not valid in base
+def _convert_digits(digits, base):
+    try:
+        return str(int(digits, base))
+    except ValueError:
+        return digits
 
 ## @brief Function to tokenize the input expression.
 # @param expr input expression
-# @return generator of tokens
-def tokenize(expr):
-    token_spec = [
-        ('NUMBER',   r"\d+(?:\.\d*)?"),      # Integer or decimal
-        ('NAME',     r"[a-zA-Z_π]\w*|√|n√"), # Identifiers (sin, cos, ANS, etc.)
-        ('OP',       r"\*\*|[+\-*/^(),]"),   # Operators, parentheses, comma
-        ('SKIP',     r"[ \t]+"),             # Skip whitespace
-        ('MISMATCH', r".")                   # Any other character = error
-    ]
-    tok_regex = "|".join(f"(?P<{n}>{p})" for n, p in token_spec)
-    for m in re.finditer(tok_regex, expr):
+# @param number optional function converting number literals; by default integers
+# are converted to int and decimals to float
+# @param base base of the number literals (2, 8, or 10)
+# @return list of tokens
+# @details The expression is scanned once. A comma between two digits is a decimal comma,
+# except in a call of log or nthroot (also written n√) whose two arguments contain no
+# commas or parentheses, where it separates the arguments. In bases 2 and 8 the integer
+# and fractional digits of a literal are converted separately; digits not valid in the
+# base are read as decimal.
+def tokenize(expr, number=None, base=10):
+    tokens = []
+    _scan(expr, 0, len(expr), number, base, tokens)
+    return tokens
+
+## @brief Function to tokenize a part of the input expression.
+# @param expr input expression
+# @param pos start of the part
+# @param endpos end of the part
+# @param number optional function converting number literals
+# @param base base of the number literals
+# @param tokens list the tokens are appended to
+def _scan(expr, pos, endpos, number, base, tokens):
+    append = tokens.append
+    for m in _TOKEN_RE.finditer(expr, pos, endpos):
         kind, val = m.lastgroup, m.group()
         if kind == 'NUMBER':
-            yield ('NUMBER', int(val) if '.' not in val else float(val))
-        elif kind == 'NAME':
-            yield ('NAME', val)
+            if ',' in val:
+                val = val.replace(',', '.')
+            if base != 10:
+                whole, dot, frac = val.partition('.')
+                val = _convert_digits(whole, base) + dot + _convert_digits(frac, base)
+            if number is not None:
+                append(('NUMBER', number(val)))
+            else:
+                append(('NUMBER', int(val) if '.' not in val else float(val)))
         elif kind == 'OP':
-            yield ('OP', val)
-        elif kind == 'SKIP':
-            continue
-        else:
+            append(('OP', val))
+        elif kind == 'NAME':
+            append(('NAME', 'nthroot' if val == 'n√' else val))
+        elif kind == 'CALL':
+            func = m.group('func')
+            append(('NAME', 'nthroot' if func == 'n√' else func))
+            append(('OP', '('))
+            _scan(expr, m.start('arg1'), m.end('arg1'), number, base, tokens)
+            append(('OP', ','))
+            _scan(expr, m.start('arg2'), m.end('arg2'), number, base, tokens)
+            append(('OP', ')'))
+        elif kind == 'MISMATCH':
             raise SyntaxError(f"Unexpected character {val}")
 
+## @brief Precedence of the binary operators; '^' and '**' are right-associative.
+_BINARY_PREC = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 3, '**': 3}
+
 ## @brief Class to parse the tokenized input.
+# @details Operator-precedence parser with explicit operand and operator stacks, so the
+# nesting depth of the expression is not limited by Python's recursion limit. Unary minus
+# applies to the following factor and binds tighter than '^'.
 class Parser:
 
     ## @brief Constructor for the Parser class.
     # @param tokens list of tokens
     # @param last_ans last answer used in the calculator
-    def __init__(self, tokens, last_ans=0):
+    # @param lib math library providing the constants e and π
+    # @param variables names of the free variables allowed in the expression
+    # @param history if True, ANS and ANS[n] are parsed as the free variables 'ANS[0]' and
+    # 'ANS[n]' instead of the number last_ans
+    def __init__(self, tokens, last_ans=0, lib=math, variables=(), history=False):
         self.tokens = tokens
         self.pos = 0
         self.last_ans = last_ans
+        self.lib = lib
+        self.variables = variables
+        self.history = history
         
     ## @brief Function to get the current token.
     # @return current token
@@ -54,116 +125,114 @@ class Parser:
 
     ## @brief Function to parse the expression.
     # @details Parses the entire expression and returns the abstract syntax tree (AST).
+    # The operator stack holds binary operators, '(' of groups, 'uminus' and function
+    # calls as tuples (name, number of operands before the first argument).
     # @return AST node representing the expression
     def parse(self):
-        node = self.parse_expression()
-        if self.current()[0] != 'EOF':
-            raise SyntaxError("Unexpected token after end")
-        return node
+        tokens, pos, end = self.tokens, self.pos, len(self.tokens)
+        operands = []
+        operators = []
+        prefix = True       # an operand is expected
+        while True:
+            typ, val = tokens[pos] if pos < end else ('EOF','')
+            pos += 1
 
-    ## @brief Function to parse the expression.
-    # @details Handles addition and subtraction.
-    # @return AST node representing the expression
-    def parse_expression(self):
-        node = self.parse_term()
-        while self.current()[1] in ('+', '-'):
-            op = self.current()[1]; self.advance()
-            right = self.parse_term()
-            node = ('binop', op, node, right)
-        return node
+            if prefix:
+                # Number literal
+                if typ == 'NUMBER':
+                    node = ('number', val)
 
-    ## @brief Function to parse the term.
-    # @details Handles multiplication and division.
-    # @return AST node representing the term
-    def parse_term(self):
-        node = self.parse_power()
-        while self.current()[1] in ('*', '/'):
-            op = self.current()[1]; self.advance()
-            right = self.parse_power()
-            node = ('binop', op, node, right)
-        return node
+                # Identifier: ANS, constant, function or variable
+                elif typ == 'NAME':
+                    if val.upper() == 'ANS' and self.history:
+                        n = 0
+                        if pos < end and tokens[pos][1] == '[':
+                            # the index is any integral number, e.g. a Decimal with digits
+                            if pos + 2 >= end or tokens[pos + 2][1] != ']' \
+                                    or tokens[pos + 1][0] != 'NUMBER' or tokens[pos + 1][1] % 1:
+                                raise SyntaxError("Invalid ANS index")
+                            n = int(tokens[pos + 1][1])
+                            pos += 3
+                        node = ('var', f"ANS[{n}]")
+                    elif val.upper() == 'ANS':
+                        node = ('number', self.last_ans)
+                    elif val == 'e':
+                        node = ('number', self.lib.compute_e())
+                    elif val == 'π':
+                        node = ('number', self.lib.pi())
+                    elif pos < end and tokens[pos][1] == '(':
+                        if pos + 1 < end and tokens[pos + 1][1] == ')':
+                            pos += 2
+                            node = ('func0', val)
+                        else:
+                            pos += 1
+                            operators.append((val, len(operands)))
+                            continue
+                    elif val in self.variables:
+                        node = ('var', val)
+                    else:
+                        raise SyntaxError(f"Unknown identifier '{val}'")
 
-    ## @brief Function to parse power.
-    # @details Handles exponentiation.
-    # @return AST node representing power
-    def parse_power(self):
-        node = self.parse_factor()
-        while self.current()[1] in ('^', '**'):
-            op = self.current()[1]; self.advance()
-            right = self.parse_power()
-            node = ('binop', op, node, right)
-        return node
+                # Parentheses and unary minus
+                elif val == '(' or val == '-':
+                    operators.append('(' if val == '(' else 'uminus')
+                    continue
+                else:
+                    raise SyntaxError(f"Unexpected token '{val}'")
 
-    ## @brief Function to parse the factor.
-    # @details Handles parentheses, numbers, identifiers, and unary minus.
-    # @return AST node representing the factor
-    def parse_factor(self):
-        typ, val = self.current()
-
-        # Parentheses
-        if val == '(':
-            self.advance()
-            node = self.parse_expression()
-            if self.current()[1] != ')':
-                raise SyntaxError("Missing ')'")
-            self.advance()
-            return node
-
-        # Number literal
-        if typ == 'NUMBER':
-            self.advance()
-            return ('number', val)
-
-        # Identifier: ANS or function
-        if typ == 'NAME':
-            name = val
-            self.advance()
-
-            # ANS constant
-            if name.upper() == 'ANS':
-                return ('number', self.last_ans)
-            
-            # Handle constants 'e' and 'π'
-            if name == 'e':
-                return ('number', math.compute_e())
-            if name == 'π':
-                return ('number', math.pi())
-
-            # Function call
-            if self.current()[1] == '(':
-                self.advance()  
-                args = []
-
-                # Zero-argument
-                if self.current()[1] == ')':
-                    self.advance()
-                    return ('func0', name)
-
-                # One or more args
-                args.append(self.parse_expression())
-                while self.current()[1] == ',':
-                    self.advance()
-                    args.append(self.parse_expression())
-
-                if self.current()[1] != ')':
-                    raise SyntaxError("Missing ')' after function args")
-                self.advance()
-
-                if len(args) == 1:
-                    return ('func1', name, args[0])
-                if len(args) == 2:
-                    return ('func2', name, args[0], args[1])
-                raise SyntaxError("Too many function arguments")
+            else:
+                # Binary operator: reduce the operators that bind at least as tightly
+                prec = _BINARY_PREC.get(val) if typ == 'OP' else None
+                if prec is not None:
+                    while operators:
+                        top = _BINARY_PREC.get(operators[-1])
+                        if top is None or top < prec or (top == prec and prec == 3):
+                            break
+                        right = operands.pop()
+                        operands[-1] = ('binop', operators.pop(), operands[-1], right)
+                    operators.append(val)
+                    prefix = True
+                    continue
 
-            raise SyntaxError(f"Unknown identifier '{name}'")
+                # End of a group, an argument or the expression: reduce the binary operators
+                while operators and operators[-1] in _BINARY_PREC:
+                    right = operands.pop()
+                    operands[-1] = ('binop', operators.pop(), operands[-1], right)
+                top = operators[-1] if operators else None
 
-        # Unary minus
-        if val == '-':
-            self.advance()
-            node = self.parse_factor()
-            return ('uminus', node)
+                if val == ')' and top == '(':
+                    operators.pop()
+                    node = operands.pop()
+                elif val == ')' and isinstance(top, tuple):
+                    operators.pop()
+                    name, first = top
+                    args = operands[first:]
+                    del operands[first:]
+                    if len(args) == 1:
+                        node = ('func1', name, args[0])
+                    elif len(args) == 2:
+                        node = ('func2', name, args[0], args[1])
+                    else:
+                        raise SyntaxError("Too many function arguments")
+                elif val == ',' and isinstance(top, tuple):
+                    prefix = True
+                    continue
+                elif typ == 'EOF' and top is None:
+                    self.pos = pos - 1
+                    return operands[0]
+                elif top == '(':
+                    raise SyntaxError("Missing ')'")
+                elif top is not None:
+                    raise SyntaxError("Missing ')' after function args")
+                else:
+                    raise SyntaxError("Unexpected token after end")
 
-        raise SyntaxError(f"Unexpected token '{val}'")
+            # A factor is complete: apply the pending unary minuses
+            while operators and operators[-1] == 'uminus':
+                operators.pop()
+                node = ('uminus', node)
+            operands.append(node)
+            prefix = False
 
 ## @brief Function to evaluate the AST node.
 # @param node AST node
@@ -175,6 +244,9 @@ def eval_node(node, ns):
     if kind == 'number':
         return node[1]
 
+    if kind == 'var':
+        return ns[node[1]]
+
     if kind == 'binop':
         _, op, left, right = node
         l = eval_node(left, ns)
@@ -212,94 +284,811 @@ def eval_node(node, ns):
 
     raise ValueError(f"Invalid AST node {node}")
 
+## @brief Python operators of the binary operators of the calculator.
+_PY_OPS = {'+': '+', '-': '-', '*': '*', '/': '/', '^': '**', '**': '**'}
+
+## @brief Function to list the child nodes of an AST node.
+# @param node AST node
+# @return tuple of child nodes
+def _children(node):
+    kind = node[0]
+    if kind == 'binop':
+        return node[2:]
+    if kind == 'uminus':
+        return node[1:]
+    if kind in ('func1', 'func2'):
+        return node[2:]
+    return ()
+
+## @brief Python functions of the binary operators of the calculator.
+_OP_FUNCS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv,
+             '^': operator.pow, '**': operator.pow}
+
+## @brief Function to optimize the AST.
+# @param node AST node
+# @param ns namespace for functions and constants
+# @param ops optional mapping of binary operators to functions, see compile_ast()
+# @param interned optional dictionary of shared nodes kept between calls with the same ns
+# and ops; a sub-tree already optimized through it is reused instead of folded again
+# @return optimized AST node
+# @details Folds every sub-tree whose operands are all numbers into a number node by applying
+# the same operations the evaluation would. Sub-trees whose evaluation raises or returns an
+# error string are left unfolded, so evaluating them still fails as before; BudgetExceeded
+# is propagated. Identical sub-trees are merged into one shared node object, which
+# compile_ast() computes only once. The tree is walked with an explicit stack.
+def optimize(node, ns, ops=None, interned=None):
+    if interned is None:
+        interned = {}   # structural key -> shared node
+    values = []         # optimized operands
+    stack = [(node, False)]
+    while stack:
+        node, visited = stack.pop()
+        kind = node[0]
+        children = _children(node)
+        if not visited and children:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+
+        if kind == 'number':
+            val = node[1]
+            values.append(interned.setdefault(_number_key(val), node))
+            continue
+        if kind == 'var':
+            values.append(interned.setdefault(node, node))
+            continue
+
+        args = values[len(values) - len(children):]
+        del values[len(values) - len(children):]
+        key = node[:len(node) - len(children)] + tuple(id(arg) for arg in args)
+        shared = interned.get(key)
+        if shared is None:
+            shared = node[:len(node) - len(children)] + tuple(args)
+            if all(arg[0] == 'number' for arg in args):
+                shared = _fold(shared, ns, ops)
+                if shared[0] == 'number':
+                    shared = interned.setdefault(_number_key(shared[1]), shared)
+            interned[key] = shared
+        values.append(shared)
+    return values[0]
+
+## @brief Function to build the structural key of a number for optimize().
+# @param val value of a number node
+# @return key telling apart values of different types and signed zeros
+def _number_key(val):
+    return ('number', type(val), val.hex() if isinstance(val, float) else val)
+
+## @brief Function to fold a node with constant operands into a number node.
+# @param node AST node whose operands are number nodes
+# @param ns namespace for functions and constants
+# @param ops optional mapping of binary operators to functions
+# @return number node with the value of node, or node itself if it cannot be folded
+def _fold(node, ns, ops=None):
+    kind = node[0]
+    try:
+        if kind == 'binop':
+            op = (ops or _OP_FUNCS).get(node[1]) or _OP_FUNCS[node[1]]
+            val = op(node[2][1], node[3][1])
+        elif kind == 'uminus':
+            val = -node[1][1]
+        else:
+            f = ns.get(node[1].lower())
+            if not f:
+                return node
+            val = f(*(arg[1] for arg in node[2:]))
+    except BudgetExceeded:
+        raise
+    except Exception:
+        return node
+    if isinstance(val, str):
+        return node
+    return ('number', val)
+
+## @brief Function to compile the AST into a Python function.
+# @param node AST node
+# @param ns namespace for functions and constants
+# @param variables names of the free variables, in the order of the function's parameters
+# @param ops optional mapping of binary operators to functions called instead of the
+# Python operators
+# @return function taking the values of the variables and returning the value of the node
+# @details The tree is flattened in evaluation order into straight-line Python code with
+# one local variable per operation. Operators become Python operators and functions and
+# constants are bound when the code is generated, so calling the result costs only the
+# arithmetic. Node objects shared in the tree, see optimize(), are computed once.
+# The tree is walked with an explicit stack, so deep trees do not recurse. A number node,
+# e.g. a fully folded expression, gives a function returning it without generating code.
+def compile_ast(node, ns, variables=(), ops=None):
+    if node[0] == 'number':
+        value = node[1]
+        return lambda *args: value
+
+    params = {name: f"_v{i}" for i, name in enumerate(variables)}
+    ops = ops or {}
+    bound = []          # objects passed into the generated code
+    lines = []          # statements of the generated function
+    values = []         # Python expressions of already compiled operands
+    done = {}           # id of a compiled shared node -> its local variable
+
+    def bind(obj):
+        bound.append(obj)
+        return f"_b{len(bound) - 1}"
+
+    stack = [(node, False)]
+    while stack:
+        node, visited = stack.pop()
+        kind = node[0]
+        if kind == 'number':
+            val = node[1]
+            if type(val) in (int, float) and -1e18 < val < 1e18:
+                values.append(f"({val!r})")
+            else:
+                values.append(bind(val))
+            continue
+        if kind == 'var':
+            values.append(params[node[1]])
+            continue
+        if id(node) in done:
+            values.append(done[id(node)])
+            continue
+        children = _children(node)
+        if not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+
+        args = values[len(values) - len(children):]
+        del values[len(values) - len(children):]
+        if kind == 'binop' and node[1] in ops:
+            expr = f"{bind(ops[node[1]])}({args[0]}, {args[1]})"
+        elif kind == 'binop':
+            op = _PY_OPS.get(node[1])
+            if op is None:
+                raise ValueError(f"Unknown operator {node[1]}")
+            expr = f"{args[0]} {op} {args[1]}"
+        elif kind == 'uminus':
+            expr = f"-{args[0]}"
+        elif kind in ('func0', 'func1', 'func2'):
+            f = ns.get(node[1].lower())
+            if not f:
+                raise ValueError(f"Unknown function {node[1]}")
+            expr = f"{bind(f)}({', '.join(args)})"
+        else:
+            raise ValueError(f"Invalid AST node {node}")
+        temp = f"_t{len(lines)}"
+        lines.append(f"        {temp} = {expr}")
+        values.append(temp)
+        done[id(node)] = temp
+
+    source = (f"def _factory({', '.join(f'_b{i}' for i in range(len(bound)))}):\n"
+              f"    def _compiled({', '.join(params.values())}):\n"
+              + "".join(line + "\n" for line in lines) +
+              f"        return {values[0]}\n"
+              f"    return _compiled\n")
+    code = {}
+    exec(compile(source, "<expression>", "exec"), code)
+    return code['_factory'](*bound)
+
 ## @brief Function to build a safe namespace for the calculator.
 # @param last_ans last answer used in the calculator
 # @param base base for number conversion
+# @param lib math library providing the functions
 # @return dictionary of functions and constants
-def build_safe_ns(last_ans, base=10):
+def build_safe_ns(last_ans, base=10, lib=math):
     return {
-        'sin':       math.sin,
-        'cos':       math.cos,
-        'tg':        math.tg,
-        'cotg':      math.cotg,
-        'ln':        math.ln,
-        'log':       math.log,
-        '√':         math.sqrt,
-        'n√':        math.nthroot,
-        'nthroot':   math.nthroot,  
-        'abs':       math.abs,
-        'fact':      math.fact,
-        'compute_e': math.compute_e,
-        'pi':        math.pi,
+        'sin':       lib.sin,
+        'cos':       lib.cos,
+        'tg':        lib.tg,
+        'cotg':      lib.cotg,
+        'ln':        lib.ln,
+        'log':       lib.log,
+        '√':         lib.sqrt,
+        'n√':        lib.nthroot,
+        'nthroot':   lib.nthroot,
+        'abs':       lib.abs,
+        'fact':      lib.fact,
+        'compute_e': lib.compute_e,
+        'pi':        lib.pi,
     }
 
+## @brief Result of evaluate() for an expression that exceeds its budget.
+BUDGET_ERROR = "Error: budget exceeded"
+
+## @brief Limits of the work done by one evaluation, None for unlimited.
+# @details Fields:
+# - time: wall-clock time in seconds
+# - max_bits: largest bit length of an integer result or intermediate result; with the
+#   Decimal backend also the largest precision, in bits. If only time is set, a ceiling
+#   is derived from it, see TIME_BITS.
+# - max_exponent: largest absolute value of an exponent
+# - max_fact: largest argument of fact()
+Budget = collections.namedtuple('Budget', ['time', 'max_bits', 'max_exponent', 'max_fact'],
+                                defaults=(None, None, None, None))
+
+## @brief Bit length of the results allowed by a time budget of one second without max_bits.
+# @details A single multiplication or power is not interrupted by the time budget, so a
+# budget with only a time limit gets the max_bits TIME_BITS * time ** 0.625; the exponent
+# follows the cost of multiplying big integers, which grows about as bits ** 1.6.
+TIME_BITS = 1 << 22
+
+## @brief Function to get the size limits of a budget.
+# @param budget Budget
+# @return Budget without a time limit, with max_bits derived from the time limit if unset
+def _limits(budget):
+    limits = budget._replace(time=None)
+    if budget.time is not None and budget.max_bits is None:
+        limits = limits._replace(max_bits=int(TIME_BITS * budget.time ** 0.625))
+    return limits
+
+## @brief Exception raised when an evaluation exceeds its budget.
+class BudgetExceeded(ArithmeticError):
+    pass
+
+## @var _deadline
+# monotonic time at which the current evaluation runs out of time, None for no limit
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+## @brief Function to check the time budget of the current evaluation.
+# @details Raises BudgetExceeded if the deadline has passed.
+def _check_time():
+    deadline = _deadline.get()
+    if deadline is not None and time.monotonic() > deadline:
+        raise BudgetExceeded("time limit exceeded")
+
+## @brief Natural logarithm of 2, converts lgamma() to bits.
+_LN2 = 0.6931471805599453
+
+## @brief Function to guard a namespace and the operators with a budget.
+# @param ns namespace for functions and constants
+# @param budget Budget whose size limits are enforced
+# @return tuple (guarded namespace, guarded operators for optimize() and compile_ast())
+# @details Multiplication, powers and factorials check the size of their result before
+# computing it. Every guarded call also checks the time budget, so runaway work stops at
+# the next function call or guarded operator; a single operation is not interrupted, which
+# the size limits keep short, see _limits().
+def _guard(ns, budget):
+    max_bits, max_exponent, max_fact = budget.max_bits, budget.max_exponent, budget.max_fact
+
+    def check_bits(bits):
+        if max_bits is not None and bits > max_bits:
+            raise BudgetExceeded("result too large")
+
+    def mul(a, b):
+        _check_time()
+        if isinstance(a, int) and isinstance(b, int):
+            check_bits(a.bit_length() + b.bit_length())
+        return a * b
+
+    def power(a, b):
+        _check_time()
+        if max_exponent is not None and abs(b) > max_exponent:
+            raise BudgetExceeded("exponent too large")
+        if isinstance(a, int) and isinstance(b, int) and b > 0 and abs(a) > 1:
+            check_bits(b * log2(abs(a)))
+        return a ** b
+
+    def fact(n, fact=ns['fact']):
+        _check_time()
+        if max_fact is not None and n > max_fact:
+            raise BudgetExceeded("factorial argument too large")
+        if n > 1:
+            check_bits(lgamma(float(n) + 1) / _LN2)
+        return fact(n)
+
+    def checked(f):
+        def call(*args):
+            _check_time()
+            return f(*args)
+        return call
+
+    guarded = {name: checked(f) for name, f in ns.items()}
+    guarded['fact'] = fact
+    return guarded, {'*': mul, '^': power, '**': power}
+
+## @brief Class of an expression compiled once for evaluation over many variable bindings.
+class CompiledExpression:
+
+    ## @brief Constructor for the CompiledExpression class.
+    # @param expr input expression
+    # @param variables names of the free variables of the expression
+    # @param base base for number conversion (2, 8, or 10)
+    # @details Raises SyntaxError if the expression is invalid or a variable name clashes
+    # with a constant or a function.
+    def __init__(self, expr, variables=(), base=10):
+        self.variables = tuple(variables)
+        self.base = base
+        ns = build_safe_ns(0, base)
+        for name in self.variables:
+            if not re.fullmatch(r"[a-zA-Z_]\w*", name) or name in ('e', 'π') \
+                    or name.upper() == 'ANS' or name.lower() in ns:
+                raise SyntaxError(f"Invalid variable name '{name}'")
+        tokens = tokenize(expr, base=base) + [('EOF','')]
+        self.ast = optimize(Parser(tokens, 0, math, self.variables).parse(), ns)
+        self._scalar = compile_ast(self.ast, ns, self.variables)
+        self._vector = None
+
+    ## @brief Function to evaluate the expression.
+    # @param args values of the variables in the order of variables
+    # @param bindings values of the variables by name
+    # @return value of the expression
+    # @details With numbers, the result is a number or "Error" like the math_lib functions.
+    # If any value is an array (e.g. a NumPy ndarray), the expression is evaluated
+    # element-wise in one vectorized pass by math_lib.vec and the result is a float64 array,
+    # NaN where the scalar evaluation gives "Error".
+    def __call__(self, *args, **bindings):
+        if bindings:
+            args += tuple(bindings.pop(name) for name in self.variables[len(args):]
+                          if name in bindings)
+        if bindings or len(args) != len(self.variables):
+            raise TypeError(f"expected values of {', '.join(self.variables) or 'no variables'}")
+        if all(isinstance(val, (int, float)) for val in args):
+            try:
+                return self._scalar(*args)
+            except Exception:
+                return "Error"
+        return self._evaluate_vector(args)
+
+    ## @brief Function to evaluate the expression element-wise over arrays.
+    # @param args values of the variables, numbers or arrays
+    # @return float64 ndarray of results broadcast to the shape of the arguments
+    def _evaluate_vector(self, args):
+        vec = math.vec
+        if self._vector is None:
+            ns = build_safe_ns(0, self.base, vec)
+            ops = {'/': vec.div, '^': vec.power, '**': vec.power}
+            self._vector = compile_ast(self.ast, ns, self.variables, ops)
+        args = [vec.np.asarray(val, dtype=vec.np.float64) for val in args]
+        with vec.np.errstate(all='ignore'):
+            result = vec.np.asarray(self._vector(*args), dtype=vec.np.float64)
+        shape = vec.np.broadcast_shapes(*(val.shape for val in args))
+        return vec.np.broadcast_to(result, shape).copy()
+
+## @brief Function to compile an expression with free variables.
+# @param expr input expression
+# @param variables names of the free variables of the expression
+# @param base base for number conversion (2, 8, or 10)
+# @return CompiledExpression, callable with the values of the variables
+def compile_expression(expr, variables=(), base=10):
+    return CompiledExpression(expr, variables, base)
+
 ## @brief Function to evaluate the expression.
 # @param expr input expression
 # @param base base for number conversion (2, 8, or 10)
-# @return evaluated result as a string
-def evaluate(expr, base=10):
-    last_ans = 0
+# @param digits number of significant digits; if given in base 10, the expression is
+# evaluated by the arbitrary-precision backend math_lib_decimal instead of math_lib
+# @param budget optional Budget limiting the work done by the evaluation
+# @return evaluated result as a string, BUDGET_ERROR if the evaluation exceeds its budget
+def evaluate(expr, base=10, digits=None, budget=None):
+    return _evaluate(_run, expr, base, digits, budget)
 
-    # 1) Convert base-literal → decimal
-    if base != 10:
-        if base == 2:
-            pat, conv = r'\b[01]+\b', lambda m: str(int(m.group(), 2))
-        else:
-            pat, conv = r'\b[0-7]+\b', lambda m: str(int(m.group(), 8))
-        expr = re.sub(pat, conv, expr)
-    
-    expr = expr.replace("n√", "nthroot")
-
-    # 2)&3) Mask commas, convert decimal commas
-    expr = re.sub(r'(nthroot\(\s*[^,()]+\s*),(?=\s*[^,()]+\s*\))',
-                  lambda m: m.group(1) + '#', expr)
-    expr = re.sub(r'(log\(\s*[^,()]+\s*),(?=\s*[^,()]+\s*\))',
-                  lambda m: m.group(1) + '#', expr)
-    expr = re.sub(r'(?<=\d),(?=\d)', '.', expr)
-    expr = expr.replace('#', ',')
-    expr = re.sub(r'n√\s*\(([^,]+),\s*([^)]+)\)', r'nthroot(\1,\2)', expr)
+## @brief Largest number of expressions sent to a worker process at once by evaluate_many().
+EVALUATE_MANY_CHUNKSIZE = 256
+
+## @brief Function to evaluate a batch of expressions in parallel.
+# @param exprs iterable of input expressions
+# @param base base for number conversion (2, 8, or 10)
+# @param digits number of significant digits, see evaluate()
+# @param budget optional Budget of every evaluation, see evaluate()
+# @param workers number of worker processes, by default the number of CPUs
+# @param chunksize number of expressions sent to a worker at once, by default the batch is
+# split into about four chunks per worker, at most EVALUATE_MANY_CHUNKSIZE expressions each
+# @return list of results as strings, in the order of exprs
+# @details Every expression is evaluated by evaluate() in a process pool, so invalid
+# expressions give "Error" without affecting the rest of the batch. Each worker keeps its own
+# parse cache for the whole batch. With one worker, or a single expression, the batch is
+# evaluated in the calling process.
+def evaluate_many(exprs, base=10, digits=None, budget=None, workers=None, chunksize=None):
+    exprs = list(exprs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(exprs))
+    if workers <= 1:
+        return [evaluate(expr, base, digits, budget) for expr in exprs]
+    if chunksize is None:
+        chunksize = min(EVALUATE_MANY_CHUNKSIZE, -(-len(exprs) // (4 * workers)))
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(functools.partial(evaluate, base=base, digits=digits, budget=budget), exprs,
+                             chunksize=chunksize))
+
+## @brief Function to select the math library of a backend.
+# @param digits number of significant digits of the Decimal backend, None for math_lib
+# @return tuple (math library, number literal converter for tokenize())
+def _backend(digits):
+    if digits is None:
+        return math, None
+    import math_lib_decimal
+    return math_lib_decimal, math_lib_decimal.Decimal
 
+## @brief Function to parse and compile the expression.
+# @param expr input expression
+# @param base base for number conversion (2, 8, or 10)
+# @param digits number of significant digits of the Decimal backend, None for math_lib
+# @param limits optional Budget whose size limits guard the operations, see _guard()
+# @return compiled function, or in base 2 and 8 a pair of compiled functions of the dividend
+# and divisor if the expression is a division; None if the expression is invalid
+# @details Raises BudgetExceeded if constant folding exceeds the budget, so that the
+# failure is not cached.
+def _parse(expr, base, digits, limits=None):
+    lib, number = _backend(digits)
     try:
-        tokens = list(tokenize(expr)) + [('EOF','')]
-        parser = Parser(tokens, last_ans)
-        ast    = parser.parse()
-        ns     = build_safe_ns(last_ans, base)
+        tokens = tokenize(expr, number, base) + [('EOF','')]
+        ast = Parser(tokens, 0, lib).parse()
+        ns = build_safe_ns(0, base, lib)
+        ops = None
+        if limits is not None:
+            ns, ops = _guard(ns, limits)
 
         # 6) Integer division remainder in 2/8
         if base != 10 and ast[0] == 'binop' and ast[1] == '/':
-            l = eval_node(ast[2], ns)
-            r = eval_node(ast[3], ns)
-            if r == 0:
-                return "Error"
-            q, rem = l // r, l % r
-            if base == 2:
-                return f"{bin(q)[2:]} zv.{bin(rem)[2:]}"
-            else:
-                return f"{oct(q)[2:]} zv.{oct(rem)[2:]}"
-
-        # Standard eval
-        result = eval_node(ast, ns)
-        if isinstance(result, float) and result.is_integer():
-            result = int(result)
-            
-        # 7) Convert back to chosen base / format
-        if isinstance(result, int):
-            if base == 2:
-                return bin(result)[2:]
-            if base == 8:
-                return oct(result)[2:]
-            return str(result)
-
-        # Float results: round, ensure a ".0", and fix "-0.0"
-        s = f"{round(result,10):.10f}".rstrip('0').rstrip('.')
-        if '.' not in s:
-            s += '.0'
-        if s == "-0.0":
-            s = "0.0"
-        return s
+            return (compile_ast(optimize(ast[2], ns, ops), ns, ops=ops),
+                    compile_ast(optimize(ast[3], ns, ops), ns, ops=ops))
+        return compile_ast(optimize(ast, ns, ops), ns, ops=ops)
+    except BudgetExceeded:
+        raise
+    except Exception:
+        return None
+
+## @brief Default number of compiled expressions kept by evaluate().
+PARSE_CACHE_SIZE = 1024
+
+## @var _parse_cached
+# _parse() wrapped in an LRU cache keyed by (expression, base, digits, limits)
+_parse_cached = functools.lru_cache(maxsize=PARSE_CACHE_SIZE)(_parse)
+
+## @brief Function to get the statistics of the parse cache.
+# @return named tuple (hits, misses, maxsize, currsize)
+def parse_cache_info():
+    return _parse_cached.cache_info()
 
+## @brief Function to empty the parse cache and reset its statistics.
+def clear_parse_cache():
+    _parse_cached.cache_clear()
+
+## @brief Function to resize the parse cache.
+# @param maxsize maximal number of cached expressions, None for unbounded, 0 to disable
+# @details The cache is emptied.
+def set_parse_cache_size(maxsize):
+    global _parse_cached
+    _parse_cached = functools.lru_cache(maxsize=maxsize)(_parse)
+
+## @brief Function to evaluate the expression within its budget with the selected backend.
+# @param run function (expr, base, digits, limits) computing the result string
+# @param expr input expression
+# @param base base for number conversion (2, 8, or 10)
+# @param digits number of significant digits of the Decimal backend, ignored unless base is 10
+# @param budget optional Budget; its time limit is set as the deadline of the evaluation and
+# its size limits, see _limits(), are passed to run as limits
+# @return evaluated result as a string
+def _evaluate(run, expr, base, digits, budget):
+    if base != 10:
+        digits = None
+    limits = token = None
+    if budget is not None:
+        limits = _limits(budget)
+        if digits is not None and limits.max_bits is not None \
+                and digits * log2(10) > limits.max_bits:
+            return BUDGET_ERROR
+        token = _deadline.set(None if budget.time is None else time.monotonic() + budget.time)
+    try:
+        if digits is None:
+            return run(expr, base, digits, limits)
+        import decimal
+        with decimal.localcontext() as ctx:
+            ctx.prec = digits + 10
+            return run(expr, base, digits, limits)
+    finally:
+        if token is not None:
+            _deadline.reset(token)
+
+## @brief Function to evaluate the expression through the parse cache.
+# @param expr input expression
+# @param base base for number conversion (2, 8, or 10)
+# @param digits number of significant digits of the Decimal backend, None for math_lib
+# @param limits optional Budget whose size limits guard the operations
+# @return evaluated result as a string
+def _run(expr, base, digits, limits):
+    try:
+        program = _parse_cached(expr, base, digits, limits)
+        if program is None:
+            return "Error"
+        return _format(_compute(program), base, digits, limits)
+    except BudgetExceeded:
+        return BUDGET_ERROR
     except Exception:
         return "Error"
 
+## @brief Function to compute the value of a compiled expression.
+# @param program compiled function, or pair of compiled functions from _parse()
+# @param args values of the free variables
+# @return value of the expression; for a pair, the tuple (quotient, remainder)
+# @details Raises like the compiled functions, ZeroDivisionError for a zero divisor.
+def _compute(program, args=()):
+    # 6) Integer division remainder in 2/8
+    if isinstance(program, tuple):
+        l = program[0](*args)
+        r = program[1](*args)
+        return l // r, l % r
+    return program(*args)
+
+## @brief Function to format the value of an expression.
+# @param value value from _compute()
+# @param base base for number conversion (2, 8, or 10)
+# @param digits number of significant digits of the Decimal backend, None for math_lib
+# @param limits optional Budget whose max_bits limits integer results
+# @return result as a string
+# @details Raises if the value is not a number, e.g. an error string of math_lib.
+def _format(value, base, digits, limits=None):
+    if isinstance(value, tuple):
+        q, rem = value
+        if base == 2:
+            return f"{bin(q)[2:]} zv.{bin(rem)[2:]}"
+        else:
+            return f"{oct(q)[2:]} zv.{oct(rem)[2:]}"
+
+    result = value
+    if limits is not None and limits.max_bits is not None and isinstance(result, int) \
+            and result.bit_length() > limits.max_bits:
+        raise BudgetExceeded("result too large")
+    if digits is not None:
+        result = _from_decimal(result, digits)
+    if isinstance(result, float) and result.is_integer():
+        result = int(result)
+
+    # 7) Convert back to chosen base / format
+    if isinstance(result, int):
+        if base == 2:
+            return bin(result)[2:]
+        if base == 8:
+            return oct(result)[2:]
+        return str(result)
+
+    # Float results: round, ensure a ".0", and fix "-0.0"
+    if digits is not None:
+        s = f"{result:f}".rstrip('0').rstrip('.')
+    else:
+        s = f"{round(result,10):.10f}".rstrip('0').rstrip('.')
+    if '.' not in s:
+        s += '.0'
+    if s == "-0.0":
+        s = "0.0"
+    return s
+
+## @brief Function to round a Decimal result to the requested number of digits.
+# @param result result of the Decimal backend
+# @param digits number of significant digits
+# @return int for integral results, otherwise Decimal rounded to digits
+def _from_decimal(result, digits):
+    if isinstance(result, int) or result == result.to_integral_value():
+        return int(result)
+    import decimal
+    with decimal.localcontext() as ctx:
+        ctx.prec = digits
+        return +result
+
+## @brief Default number of results kept in the history of a CalculatorSession.
+SESSION_HISTORY_SIZE = 100
+
+## @brief Default number of memoized entries of a CalculatorSession before they are dropped.
+SESSION_MEMO_SIZE = 4096
+
+## @brief Class of a calculator session with a history of results.
+# @details ANS is the last result and ANS[n] the result n evaluations before it, 0 if the
+# history is shorter. Results are kept as numbers, so ANS has the full precision of the
+# result. Expressions are parsed once per session and optimized into shared nodes, see
+# optimize(), so equal sub-trees of different expressions are one node and constant ones
+# are computed once; results are memoized by their nodes and the values of the ANS they use.
+# Sessions share no state and can be used independently in one process.
+class CalculatorSession:
+
+    ## @brief Constructor for the CalculatorSession class.
+    # @param base base for number conversion (2, 8, or 10)
+    # @param digits number of significant digits, see evaluate()
+    # @param budget optional Budget limiting the work done by every evaluation
+    # @param history_size number of results kept for ANS[n]
+    # @param memo_size number of memoized entries kept before they are dropped
+    def __init__(self, base=10, digits=None, budget=None,
+                 history_size=SESSION_HISTORY_SIZE, memo_size=SESSION_MEMO_SIZE):
+        self.base = base
+        self.digits = digits if base == 10 else None
+        self.budget = budget
+        self.memo_size = memo_size
+        self.history = collections.deque(maxlen=history_size)
+        self._lib, self._number = _backend(self.digits)
+        self._ns = build_safe_ns(0, base, self._lib)
+        self._ops = None
+        if budget is not None:
+            self._ns, self._ops = _guard(self._ns, _limits(budget))
+        self._interned = {}     # structural key -> shared node, see optimize()
+        self._parsed = {}       # expression -> (roots, variable names), None if invalid
+        self._programs = {}     # ids of roots -> compiled program
+        self._results = {}      # (ids of roots, keys of the ANS values) -> value
+
+    ## @brief Function to get a result from the history.
+    # @param n number of evaluations before the last one
+    # @return result, 0 if the history is shorter
+    def ans(self, n=0):
+        if n < len(self.history):
+            return self.history[-1 - n]
+        return 0
+
+    ## @brief Function to empty the history and the memoized entries.
+    def clear(self):
+        self.history.clear()
+        self._clear_memo()
+
+    ## @brief Function to drop the memoized entries.
+    def _clear_memo(self):
+        self._interned.clear()
+        self._parsed.clear()
+        self._programs.clear()
+        self._results.clear()
+
+    ## @brief Function to evaluate an expression and add its result to the history.
+    # @param expr input expression
+    # @return evaluated result as a string like evaluate()
+    # @details Failed evaluations are not added to the history. A remainder division in
+    # base 2 or 8 adds the quotient.
+    def evaluate(self, expr):
+        return _evaluate(self._run, expr, self.base, self.digits, self.budget)
+
+    ## @brief Function to evaluate an expression within the context set up by _evaluate().
+    # @param expr input expression
+    # @param base base for number conversion
+    # @param digits number of significant digits, None for math_lib
+    # @param limits size limits of the budget, already applied to the namespace
+    # @return evaluated result as a string
+    def _run(self, expr, base, digits, limits):
+        try:
+            parsed = self._parse(expr)
+            if parsed is None:
+                return "Error"
+            roots, names = parsed
+            args = tuple(self.ans(int(name[4:-1])) for name in names)
+            key = (tuple(id(root) for root in roots), tuple(_number_key(val) for val in args))
+            value = self._results.get(key)
+            if value is None:
+                program = self._programs.get(key[0])
+                if program is None:
+                    program = tuple(compile_ast(root, self._ns, names, self._ops)
+                                    for root in roots)
+                    program = self._programs[key[0]] = program if len(program) > 1 else program[0]
+                value = _compute(program, args)
+            result = _format(value, base, digits, limits)
+        except BudgetExceeded:
+            return BUDGET_ERROR
+        except Exception:
+            return "Error"
+        # ANS chains add a result per evaluation without parsing anything new
+        if len(self._results) >= self.memo_size:
+            self._results.clear()
+        self._results[key] = value
+        self.history.append(value[0] if isinstance(value, tuple) else value)
+        return result
+
+    ## @brief Function to parse and optimize an expression once per session.
+    # @param expr input expression
+    # @return tuple (optimized roots, sorted names of the ANS variables), None if invalid
+    # @details Base 2 and 8 expressions with a top-level division have two roots, the
+    # dividend and the divisor. BudgetExceeded is propagated.
+    def _parse(self, expr):
+        try:
+            return self._parsed[expr]
+        except KeyError:
+            pass
+        if len(self._interned) + len(self._results) > self.memo_size:
+            self._clear_memo()
+        try:
+            tokens = tokenize(expr, self._number, self.base) + [('EOF','')]
+            ast = Parser(tokens, 0, self._lib, history=True).parse()
+            trees = (ast,)
+            # 6) Integer division remainder in 2/8
+            if self.base != 10 and ast[0] == 'binop' and ast[1] == '/':
+                trees = ast[2:]
+            roots = tuple(optimize(tree, self._ns, self._ops, self._interned) for tree in trees)
+        except BudgetExceeded:
+            raise
+        except Exception:
+            self._parsed[expr] = None
+            return None
+        names = set()
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            if node[0] == 'var':
+                names.add(node[1])
+            else:
+                stack.extend(_children(node))
+        parsed = self._parsed[expr] = (roots, tuple(sorted(names)))
+        return parsed
+
+## @brief Number of results written to the output at once by evaluate_stream().
+STREAM_BLOCK_LINES = 1024
+
+## @brief Function to evaluate expressions read line by line from a stream.
+# @param infile input text stream, one expression per line
+# @param outfile output text stream, one result per line
+# @param base base for number conversion (2, 8, or 10)
+# @param digits number of significant digits, see evaluate()
+# @details Empty lines give empty output lines, so the output stays aligned with the input.
+# Results are written in blocks of STREAM_BLOCK_LINES lines; if the input is a terminal,
+# every result is written and flushed at once.
+def evaluate_stream(infile, outfile, base=10, digits=None):
+    interactive = infile.isatty()
+    block = []
+    for line in infile:
+        expr = line.strip()
+        block.append(evaluate(expr, base, digits) if expr else "")
+        if interactive or len(block) >= STREAM_BLOCK_LINES:
+            outfile.write("\n".join(block) + "\n")
+            block.clear()
+            if interactive:
+                outfile.flush()
+    if block:
+        outfile.write("\n".join(block) + "\n")
+    outfile.flush()
+
+## @brief Usage of the command line interface.
+_USAGE = """usage: python3 calculator.py [--stdin] [--base {2,8,10}] [--digits N] [EXPR ...]
+
+Without arguments, the graphical calculator is started.
+
+positional arguments:
+  EXPR             expressions to evaluate, one result per line
+
+options:
+  -h, --help       show this help message and exit
+  --stdin          evaluate expressions read from standard input, one per line
+  --base {2,8,10}  base for number conversion (default 10)
+  --digits N       evaluate with N significant digits
+"""
+
+## @brief Main entry point of the calculator.
+# @param argv command line arguments, by default sys.argv[1:]
+# @return exit status
+# @details Options are parsed by hand: importing argparse would take a large part of the
+# start-up time of the headless modes, which import only the engine.
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    options = {'--base': 10, '--digits': None}
+    stdin = False
+    exprs = []
+    args = iter(argv)
+    for arg in args:
+        name, eq, value = arg.partition('=')
+        if arg in ('-h', '--help'):
+            sys.stdout.write(_USAGE)
+            return 0
+        elif arg == '--stdin':
+            stdin = True
+        elif name in options:
+            value = value if eq else next(args, '')
+            if not value.isdigit():
+                return _usage_error(f"argument {name}: expected an integer")
+            options[name] = int(value)
+        elif arg.startswith('--'):
+            return _usage_error(f"unrecognized argument {arg}")
+        else:
+            exprs.append(arg)
+    base, digits = options['--base'], options['--digits']
+    if base not in (2, 8, 10):
+        return _usage_error("argument --base: expected 2, 8 or 10")
+
+    if stdin:
+        evaluate_stream(sys.stdin, sys.stdout, base, digits)
+    elif exprs:
+        sys.stdout.write("".join(evaluate(expr, base, digits) + "\n" for expr in exprs))
+    else:
+        import gui
+        gui.main()
+    return 0
+
+## @brief Function to report an invalid command line.
+# @param message description of the error
+# @return exit status 2
+def _usage_error(message):
+    sys.stderr.write(_USAGE.split("\n", 1)[0] + f"\ncalculator.py: error: {message}\n")
+    return 2
+
 if __name__ == "__main__":
-    gui.main()
+    sys.exit(main())
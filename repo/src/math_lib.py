@@ -2,6 +2,172 @@
 # @brief Library for mathematical operations.
 # @date 2025-04-29
 
+import os
+import time
+
+
+## @brief Class collecting statistics of the series-based functions.
+# @details Instances are filled by the instrumented functions while instrumentation is on,
+# see enable_stats().
+class SeriesStats:
+
+    ## @brief Constructor for the SeriesStats class.
+    def __init__(self):
+        self.depth = 0
+        self.reset()
+
+    ## @brief Function to clear all collected statistics.
+    def reset(self):
+        self.calls = {}
+        self.histograms = {}
+        self.total_time = {}
+        self.pending = 0
+
+    ## @brief Function to start one call of an instrumented function.
+    # @return iterations pending for the enclosing instrumented call, to pass to record()
+    # @details Iterations of uninstrumented calls made outside of any instrumented call,
+    # e.g. of functions bound before enable_stats(), are dropped here.
+    def enter(self):
+        outer = self.pending if self.depth else 0
+        self.pending = 0
+        self.depth += 1
+        return outer
+
+    ## @brief Function to record one call of an instrumented function.
+    # @param name name of the function
+    # @param elapsed duration of the call in seconds
+    # @param outer value returned by enter() at the start of the call
+    # @details The series iterations added to pending during the call are attributed to it
+    # and to the enclosing instrumented calls.
+    def record(self, name, elapsed, outer=0):
+        iterations = self.pending
+        self.pending = outer + iterations
+        self.depth -= 1
+        self.calls[name] = self.calls.get(name, 0) + 1
+        histogram = self.histograms.setdefault(name, {})
+        histogram[iterations] = histogram.get(iterations, 0) + 1
+        self.total_time[name] = self.total_time.get(name, 0.0) + elapsed
+
+    ## @brief Function to export the statistics.
+    # @return dictionary keyed by function name with the number of calls, the histogram
+    # of iteration counts and the cumulative time in seconds
+    def snapshot(self):
+        return {
+            name: {
+                'calls': calls,
+                'iterations': dict(sorted(self.histograms[name].items())),
+                'total_time': self.total_time[name],
+            }
+            for name, calls in self.calls.items()
+        }
+
+
+## @brief Names of the functions timed while instrumentation is on.
+_INSTRUMENTED = ('arctan', 'ln', 'sincos', 'sin', 'cos', 'tg', 'cotg', 'compute_e')
+
+## @var _stats
+# statistics being collected, None while instrumentation is off
+_stats = None
+
+## @var _originals
+# uninstrumented functions replaced by enable_stats()
+_originals = {}
+
+
+## @brief Function to wrap a function so that its calls are recorded.
+# @param name name of the function
+# @param func function to wrap
+# @return wrapper recording calls of func into _stats
+def _timed(name, func):
+    def wrapper(*args, **kwargs):
+        stats = _stats
+        if stats is None:
+            return func(*args, **kwargs)
+        outer = stats.enter()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.record(name, time.perf_counter() - start, outer)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+## @brief Function to turn on the instrumentation of the series-based functions.
+# @details Replaces the functions in _INSTRUMENTED by wrappers recording call counts,
+# iteration-count histograms and cumulative time. While instrumentation is off the
+# functions run unwrapped; the series only check whether _stats is set once per call.
+def enable_stats():
+    global _stats
+    if _stats is None:
+        _stats = SeriesStats()
+        module = globals()
+        for name in _INSTRUMENTED:
+            _originals[name] = module[name]
+            module[name] = _timed(name, module[name])
+
+
+## @brief Function to turn off the instrumentation and restore the original functions.
+def disable_stats():
+    global _stats
+    globals().update(_originals)
+    _originals.clear()
+    _stats = None
+
+
+## @brief Function to clear the collected statistics.
+def reset_stats():
+    if _stats is not None:
+        _stats.reset()
+
+
+## @brief Function to get the collected statistics.
+# @return dictionary as returned by SeriesStats.snapshot(), None if instrumentation is off
+def get_stats():
+    return None if _stats is None else _stats.snapshot()
+
+
+## @brief Function to write the collected statistics as JSON.
+# @param file path of the output file or a stream, standard error by default
+def dump_stats(file=None):
+    import json
+    import sys
+    stats = get_stats()
+    if file is None:
+        file = sys.stderr
+    if isinstance(file, str):
+        with open(file, 'w') as f:
+            json.dump(stats, f, indent=2)
+    else:
+        json.dump(stats, file, indent=2)
+        file.write("\n")
+
+
+## @brief Maximum number of entries kept in the constant cache.
+_CONSTANT_CACHE_SIZE = 64
+
+## @var _constants
+# cache of computed constants keyed by (name, precision)
+_constants = {}
+
+
+## @brief Function to look up a constant in the cache, computing it on a miss.
+# @param name name of the constant
+# @param precision precision the constant is computed with
+# @param compute function computing the constant for the given precision
+# @return value of the constant
+# @details The cache is bounded; when it is full, it is cleared before the new value is stored.
+def _cached_constant(name, precision, compute):
+    key = (name, precision)
+    try:
+        return _constants[key]
+    except KeyError:
+        pass
+    if len(_constants) >= _CONSTANT_CACHE_SIZE:
+        _constants.clear()
+    value = _constants[key] = compute(precision)
+    return value
 
 
 ## @brief Function to add two numbers.
@@ -39,26 +205,92 @@ def div(a,b):
     return a/b
 
 
+## @brief Number of factorials kept in the prefix table.
+_FACT_TABLE_SIZE = 256
+
+## @var _fact_table
+# prefix table of factorials, _fact_table[k] == k!
+_fact_table = [1]
+
+
+## @brief Largest n whose factorial fits in a float.
+_FLOAT_FACT_MAX = 170
+
 ## @brief Function to calculate factorial of a number.
 # @param n number
 # @return factorial of n
-# @details If n is negative, returns "Error".
+# @details If n is negative or not an integer, returns "Error".
+# Small factorials are served from a memoized prefix table, large ones are computed
+# by binary splitting of the odd part (see _fact_odd_part()). For a float n the result is
+# a float, inf above _FLOAT_FACT_MAX like in math_lib_vec.fact().
 def fact(n):
     if n<0:
         return "Error"
-    if n==0:
-        return 1
-    return n*fact(n-1)
+    if isinstance(n, float):
+        if not n.is_integer():
+            return "Error"
+        if n > _FLOAT_FACT_MAX:
+            return float('inf')
+        return float(fact(int(n)))
+    if n < _FACT_TABLE_SIZE:
+        table = _fact_table
+        while len(table) <= n:
+            table.append(table[-1] * len(table))
+        return table[n]
+    return _fact_odd_part(n) << (n - bin(n).count('1'))
+
+
+## @brief Function to multiply all odd integers in a range.
+# @param lo first odd integer of the range
+# @param hi odd integer one past the end of the range
+# @return product of odd integers in [lo, hi)
+# @details Splits the range in halves so that the multiplied big integers have similar sizes.
+def _odd_product(lo, hi):
+    if hi - lo <= 16:
+        result = 1
+        for i in range(lo, hi, 2):
+            result *= i
+        return result
+    mid = (lo + hi) // 2 | 1
+    return _odd_product(lo, mid) * _odd_product(mid, hi)
+
+
+## @brief Function to calculate the odd part of n factorial.
+# @param n non-negative integer
+# @return n! with all factors of two removed
+# @details n! is the product of the odd parts of (n >> i)! for all i, which are built
+# incrementally from the highest bit down.
+def _fact_odd_part(n):
+    inner = outer = 1
+    upper = 3
+    for i in range(n.bit_length() - 2, -1, -1):
+        lower = upper
+        upper = ((n >> i) + 1) | 1
+        inner *= _odd_product(lower, upper)
+        outer *= inner
+    return outer
 
 
 ## @brief Function to compute the value of Euler's number.
 # @param precision number of decimal places
 # @details Computation using the Taylor series expansion.
 # @return value of euler's number
+# @details The value is cached per precision, see _cached_constant().
 def compute_e(precision=20):
-    e = 1  
-    for i in range(1, precision):
-        e += 1 / fact(i) 
+    return _cached_constant('e', precision, _compute_e)
+
+
+## @brief Function to sum the Taylor series of Euler's number.
+# @param precision number of terms
+# @return value of euler's number
+# @details Terms past the factorial prefix table are below float resolution and are skipped.
+def _compute_e(precision):
+    e = 1
+    terms = min(precision, _FACT_TABLE_SIZE)
+    for i in range(1, terms):
+        e += 1 / fact(i)
+    if _stats is not None:
+        _stats.pending += terms - 1
     return e
 
 
@@ -75,6 +307,8 @@ def arctan(x, precision=1e-17):
         term *= -x*x
         result += term / (2*n + 1)
         n += 1
+    if _stats is not None:
+        _stats.pending += n - 1
     return result
 
 
@@ -82,7 +316,15 @@ def arctan(x, precision=1e-17):
 # @param precision number of decimal places
 # @return value of pi
 # @details Computation using the Machin-like formula.
+# The value is cached per precision, see _cached_constant().
 def pi(precision=1e-17):
+    return _cached_constant('pi', precision, _compute_pi)
+
+
+## @brief Function to evaluate the Machin-like formula for pi.
+# @param precision number of decimal places
+# @return value of pi
+def _compute_pi(precision):
     return 4 * (4*arctan(1/5, precision) - arctan(1/239, precision))
 
 ## @brief Function to calculate the square of a number.
@@ -91,21 +333,54 @@ def pi(precision=1e-17):
 def square(a):
     return a*a
 
+## @brief Largest bit length of an exact integer power with a float exponent, see power().
+_EXACT_POWER_BITS = 1 << 16
+
 ## @brief Function to calculate the power of a number.
 # @param a base
 # @param b exponent
 # @return a raised to the power of b
+# @details Integral float exponents of integer bases are applied as integers,
+# so the result stays exact, unless the result would exceed _EXACT_POWER_BITS bits.
 def power(a,b):
+    if isinstance(a, int) and isinstance(b, float) and b.is_integer() \
+            and abs(b) * a.bit_length() <= _EXACT_POWER_BITS:
+        b = int(b)
     return a**b
 
 
+## @brief Function to compute the integer nth root of a non-negative integer.
+# @param a non-negative integer
+# @param n positive integer root
+# @return largest integer r with r**n <= a
+# @details Newton's method on integers, started from a power of two above the root.
+# The iterates decrease monotonically and the number of steps grows with the
+# logarithm of the bit length of a.
+def _iroot(a, n):
+    if a < 2:
+        return a
+    x = 1 << -(-a.bit_length() // n)
+    while True:
+        y = ((n - 1) * x + a // x**(n - 1)) // n
+        if y >= x:
+            return x
+        x = y
+
+
 ## @brief Function to compute the square root of a number.
 # @param a number
 # @return square root of a
 # @details If a is negative, returns "Error".
+# Integers beyond the exact range of floats go through _iroot(), so integer roots stay exact.
 def sqrt(a):
     if a < 0:
         return "Error"
+    if isinstance(a, int) and a.bit_length() > 53:
+        r = _iroot(a, 2)
+        if r*r == a:
+            return r
+        if r.bit_length() > 52:
+            return float(r)
     res = a**0.5
     res = round(res, 10)
     rint = round(res)
@@ -113,65 +388,134 @@ def sqrt(a):
         return rint
     return res
 
+
 ## @brief Function to compute the nth root of a number.
 # @param a number
 # @param n root
 # @return nth root of a
-# @details If a is negative and n is even, returns "Error".
-def nthroot(a,n):
-    if n%2 == 0 and a < 0:
-        return "Error"
+# @details If n is 0 or a is negative and n is even, returns an error message.
+# Integers beyond the exact range of floats go through _iroot(), so integer roots stay exact
+# and other roots are computed without converting a to a float.
 def nthroot(a, n):
     if n == 0:
         return "Error: Zeroth root is undefined"
     if n % 2 == 0 and a < 0:
         return "Error: Even root of negative number"
-    
+    if isinstance(n, float) and n.is_integer():
+        n = int(n)
+
+    if isinstance(a, int) and isinstance(n, int) and n > 0 and a.bit_length() > 53:
+        m = -a if a < 0 else a
+        r = _iroot(m, n)
+        if r**n == m:
+            return -r if a < 0 else r
+        # integer root of m * 2**(n*k), i.e. the root with k fractional bits, 64 bits in all
+        k = max(0, 64 - r.bit_length())
+        res = _iroot(m << (n * k), n) / (1 << k)
+        return -res if a < 0 else res
+
     if a < 0:
         res = -((-a) ** (1 / n))
     else:
         res = a ** (1 / n)
-    
+
     rint = round(res)
     if abs(rint ** n - a) < 1e-10:
         return rint
-    
+
     return res
 
 
+## @brief Function to sum the series 2*atanh(y) = ln((1+y)/(1-y)).
+# @param y argument of the series, |y| < 1
+# @param precision precision of the last summed term
+# @return value of the series
+def _atanh_series(y, precision):
+    result = 0
+    power = y
+    i = 1
+    while abs(power / i) > precision:
+        result += power / i
+        power *= y * y
+        i += 2
+    if _stats is not None:
+        _stats.pending += i // 2
+    return 2 * result
+
+
+## @brief Function to split a positive number into mantissa and binary exponent.
+# @param a positive integer or float
+# @return tuple (m, k) with a == m * 2**k and sqrt(1/2) <= m < sqrt(2)
+# @details Works on the exact integer ratio of a, so large integers beyond the float
+# range are split without overflow.
+def _frexp(a):
+    num, den = a.as_integer_ratio()
+    k = num.bit_length() - den.bit_length()
+    m = num / (den << k) if k >= 0 else (num << -k) / den
+    if m < 0.7071067811865476:
+        m *= 2
+        k -= 1
+    elif m >= 1.4142135623730951:
+        m /= 2
+        k += 1
+    return m, k
+
+
+## @brief Function to compute the natural logarithm of two.
+# @param precision precision of the last summed term
+# @return value of ln(2)
+# @details The value is cached per precision, see _cached_constant().
+def _ln2(precision=1e-20):
+    return _cached_constant('ln2', precision, _compute_ln2)
+
+
+## @brief Function to sum the series of ln(2) = 2*atanh(1/3).
+# @param precision precision of the last summed term
+# @return value of ln(2)
+def _compute_ln2(precision):
+    return _atanh_series(1/3, precision)
+
+
 ## @brief Function to calculate the natural logarithm of a number.
 # @param a number
-# @param precision number of decimal places
+# @param precision precision of the last summed term
 # @return natural logarithm of a
-# @details Computation using the Taylor series expansion.
+# @details Computation using the Taylor series expansion of atanh on the mantissa,
+# ln(m * 2**k) = ln(m) + k*ln(2). With the mantissa in [sqrt(1/2), sqrt(2)) the series
+# argument is at most 0.172, so it converges in a few terms for any magnitude of a.
 # @details If a is less than or equal to 0, returns "Error".
 def ln(a, precision=1e-20):
     if a <= 0:
         return "Error"
     if a == 1:
         return 0
-    if a > 1:
-        x = (a - 1) / (a + 1)
-        result = 0
-        power = x
-        i = 1
-        while abs(power / i) > precision:  
-            result += power / i
-            power *= x * x
-            i += 2
-        return 2 * result
-    else:
-        return -ln(1/a, precision)
+    m, k = _frexp(a)
+    return _atanh_series((m - 1) / (m + 1), precision) + k * _ln2(precision)
+
+
+## @brief Maximum number of bases kept in the logarithm base cache.
+_LOG_BASE_CACHE_SIZE = 32
+
+## @var _log_bases
+# cache of natural logarithms of recently used bases
+_log_bases = {}
 
 
 ## @brief Function to calculate the logarithm of a number with base b.
 # @param a number
 # @param b base
 # @return logarithm of a with base b
+# @details ln(b) is cached for recently used bases.
 def log(a,b):
     if a <= 0 or b <= 0 or b == 1:
         return "Error"
-    return ln(a)/ln(b)
+    try:
+        ln_b = _log_bases[b]
+    except KeyError:
+        if len(_log_bases) >= _LOG_BASE_CACHE_SIZE:
+            _log_bases.clear()
+        ln_b = _log_bases[b] = ln(b)
+    return ln(a)/ln_b
 
 
 ## @brief Function to calculate the absolute value of a number.
@@ -190,68 +534,94 @@ def _snap_to_integer(val, precision):
     return float(nearest) if abs(val - nearest) < precision else val
 
 
+## @var _SIN_COEFFS
+# Taylor coefficients of sin(x)/x in powers of x^2, truncated after x^16
+_SIN_COEFFS = tuple((-1)**k / fact(2*k + 1) for k in range(9))
+
+## @var _COS_COEFFS
+# Taylor coefficients of cos(x) in powers of x^2, truncated after x^16
+_COS_COEFFS = tuple((-1)**k / fact(2*k) for k in range(9))
+
+
+## @brief Function to evaluate sine and cosine of a reduced angle.
+# @param rad angle in radians, |rad| <= pi/4
+# @return tuple (sine, cosine)
+# @details Fixed-degree polynomials evaluated by the Horner scheme. On |rad| <= pi/4 the
+# truncation error is below 1e-19, so no convergence loop is needed.
+def _sincos_kernel(rad):
+    r2 = rad*rad
+    s = 0.0
+    for coeff in reversed(_SIN_COEFFS):
+        s = s*r2 + coeff
+    c = 0.0
+    for coeff in reversed(_COS_COEFFS):
+        c = c*r2 + coeff
+    if _stats is not None:
+        _stats.pending += len(_SIN_COEFFS)
+    return rad*s, c
+
+
+## @brief Function to calculate the sine and cosine of an angle in degrees in one pass.
+# @param x angle in degrees
+# @param precision precision of snapping results to integers
+# @return tuple (sine of x, cosine of x)
+# @details The angle is reduced to the nearest multiple of 90 degrees, leaving a remainder
+# in [-45, 45] degrees, on which _sincos_kernel() is evaluated. The quadrant then selects
+# the signs and whether sine and cosine are swapped.
+def sincos(x, precision=1e-17):
+    x = x % 360
+    quadrant = round(x / 90)
+    s, c = _sincos_kernel((x - 90*quadrant) * pi() / 180)
+    quadrant %= 4
+    if quadrant == 1:
+        s, c = c, -s
+    elif quadrant == 2:
+        s, c = -s, -c
+    elif quadrant == 3:
+        s, c = -c, s
+    return _snap_to_integer(s, precision), _snap_to_integer(c, precision)
+
+
 ## @brief Function to calculate the sine of an angle in degrees.
 # @param x angle in degrees
-# @param precision number of decimal places
+# @param precision precision of snapping results to integers
 # @return sine of x
-# @details Computation using the Taylor series expansion.
+# @details Computation using the range-reduced kernel, see sincos().
 def sin(x, precision=1e-17):
-    x = x % 360
-    rad = x * pi(precision) / 180
-    result = 0.0
-    term = rad
-    n = 1
-    while abs(term) > precision:
-        result += term
-        term *= -rad*rad / ((2*n) * (2*n + 1))
-        n += 1
-    return _snap_to_integer(result, precision)
+    return sincos(x, precision)[0]
 
 
 ## @brief Function to calculate the cosine of an angle in degrees.
 # @param x angle in degrees
-# @param precision number of decimal places
+# @param precision precision of snapping results to integers
 # @return cosine of x
-# @details Computation using the Taylor series expansion.
+# @details Computation using the range-reduced kernel, see sincos().
 def cos(x, precision=1e-17):
-    x = x % 360
-    rad = x * pi(precision) / 180
-    result = 1.0
-    term = 1.0
-    n = 1
-    while abs(term) > precision:
-        term *= -rad*rad / ((2*n - 1) * (2*n))
-        result += term
-        n += 1
-    # — if the Taylor-series remainder is extremely small, treat it as exactly zero:
-    if abs(result) < precision:
-        return 0.0
-    # otherwise snap near-integers as before
-    return _snap_to_integer(result, precision)
+    return sincos(x, precision)[1]
 
 
 ## @brief Function to calculate the tangent of an angle in degrees.
 # @param x angle in degrees
-# @param precision number of decimal places
+# @param precision precision of snapping results to integers
 # @return tangent of x
-# @details Computation using the sine and cosine functions.
+# @details Computation using sincos().
 def tg(x, precision=1e-10):
-    cos_x = cos(x, precision)
+    sin_x, cos_x = sincos(x, precision)
     if cos_x == 0:
         return "Error"
-    return sin(x, precision) / cos_x
+    return sin_x / cos_x
 
 
 ## @brief Function to calculate the cotangent of an angle in degrees.
 # @param x angle in degrees
-# @param precision number of decimal places
+# @param precision precision of snapping results to integers
 # @return cotangent of x
-# @details Computation using the sine and cosine functions.
+# @details Computation using sincos().
 def cotg(x, precision=1e-10):
-    sin_x = sin(x, precision)
+    sin_x, cos_x = sincos(x, precision)
     if sin_x == 0:
         return "Error"
-    return cos(x, precision) / sin_x
+    return cos_x / sin_x
 
 
 ## @brief Function to calculate the sum of a list of numbers.
@@ -263,4 +633,28 @@ def sum(numbers):
         total += num
     return total
 
+
+## @brief Function providing lazily imported attributes of the module.
+# @param name name of the attribute
+# @return module math_lib_vec for the attribute vec
+# @details NumPy is optional, so math_lib_vec is only imported on first access to math_lib.vec.
+def __getattr__(name):
+    if name == 'vec':
+        import math_lib_vec
+        return math_lib_vec
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Warm the cache with the constants used by the calculator and the goniometric functions
+pi()
+compute_e()
+_ln2()
+
+# MATH_LIB_STATS=1 collects statistics and dumps them to standard error at exit,
+# any other non-empty value is used as the path of the dump
+if os.environ.get('MATH_LIB_STATS'):
+    import atexit
+    enable_stats()
+    atexit.register(dump_stats, None if os.environ['MATH_LIB_STATS'] == '1' else os.environ['MATH_LIB_STATS'])
+
 # end of math_lib.py
\ No newline at end of file
@@ -0,0 +1,399 @@
+## @file math_lib_decimal.py
+# @brief Arbitrary-precision variant of math_lib using the decimal module.
+# @details Mirrors the API of math_lib. All functions compute at the precision of the
+# current decimal context (decimal.getcontext().prec significant digits), internally adding
+# guard digits, and return Decimal values. Select a precision with decimal.localcontext().
+# The constants pi and e are computed by binary splitting and cached per precision.
+# @date 2025-05-08
+
+import decimal
+from decimal import Decimal
+import math_lib as ml
+
+## @brief Number of guard digits added to the context precision inside the series.
+_GUARD = 10
+
+## @var _constants
+# cache of computed constants keyed by (name, precision)
+_constants = {}
+
+
+## @brief Function to look up a constant in the cache, computing it on a miss.
+# @param name name of the constant
+# @param compute function computing the constant for a given precision
+# @return value of the constant rounded to the context precision
+def _cached_constant(name, compute):
+    prec = decimal.getcontext().prec
+    key = (name, prec)
+    try:
+        return _constants[key]
+    except KeyError:
+        pass
+    if len(_constants) >= ml._CONSTANT_CACHE_SIZE:
+        _constants.clear()
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + _GUARD
+        value = compute(ctx.prec)
+    value = _constants[key] = +value
+    return value
+
+
+## @brief Function to convert a number to Decimal.
+# @param a int, float or Decimal
+# @return Decimal value of a
+def _dec(a):
+    return a if isinstance(a, Decimal) else Decimal(a)
+
+
+## @brief Function to add two numbers.
+# @param a first number
+# @param b second number
+# @return sum
+def add(a,b):
+    return _dec(a) + b
+
+
+## @brief Function to subtract second number from first.
+# @param a first number
+# @param b second number
+# @return difference
+def sub(a,b):
+    return _dec(a) - b
+
+
+## @brief Function to multiply two numbers.
+# @param a first number
+# @param b second number
+# @return product
+def mul(a,b):
+    return _dec(a) * b
+
+
+## @brief Function to divide first number by second.
+# @param a first number
+# @param b second number
+# @return quotient
+# @details If b is 0, returns "Error".
+def div(a,b):
+    if b==0:
+        return "Error"
+    return _dec(a) / b
+
+
+## @brief Function to calculate factorial of a number.
+# @param n number
+# @return factorial of n as an exact integral Decimal
+# @details If n is negative or not an integer, returns "Error".
+def fact(n):
+    n = _dec(n)
+    if n < 0 or n != n.to_integral_value():
+        return "Error"
+    return Decimal(ml.fact(int(n)))
+
+
+## @brief Function to sum the series of e by binary splitting.
+# @param a start of the range of terms
+# @param b end of the range of terms
+# @return tuple (P, Q) with P/Q = sum of a!/k! for k in (a, b]
+def _e_split(a, b):
+    if b - a == 1:
+        return 1, b
+    m = (a + b) // 2
+    p_am, q_am = _e_split(a, m)
+    p_mb, q_mb = _e_split(m, b)
+    return p_am*q_mb + p_mb, q_am*q_mb
+
+
+## @brief Function to compute Euler's number at a given precision.
+# @param prec number of significant digits
+# @return value of euler's number
+def _compute_e(prec):
+    terms = 2
+    digits = 0
+    while digits < prec:
+        digits += ml.log(terms, 10)
+        terms += 1
+    p, q = _e_split(0, terms)
+    return 1 + Decimal(p) / q
+
+
+## @brief Function to compute the value of Euler's number.
+# @return value of euler's number at the context precision
+# @details Computation using binary splitting of the Taylor series.
+def compute_e():
+    return _cached_constant('e', _compute_e)
+
+
+## @brief Constant of the Chudnovsky series, 640320**3 // 24.
+_CHUDNOVSKY_C3 = 10939058860032000
+
+
+## @brief Function to sum the Chudnovsky series by binary splitting.
+# @param a start of the range of terms
+# @param b end of the range of terms
+# @return tuple (P, Q, T) of the binary splitting recurrence
+def _pi_split(a, b):
+    if b - a == 1:
+        if a == 0:
+            p = q = 1
+        else:
+            p = (6*a - 5) * (2*a - 1) * (6*a - 1)
+            q = a*a*a * _CHUDNOVSKY_C3
+        t = p * (13591409 + 545140134*a)
+        return p, q, -t if a & 1 else t
+    m = (a + b) // 2
+    p_am, q_am, t_am = _pi_split(a, m)
+    p_mb, q_mb, t_mb = _pi_split(m, b)
+    return p_am*p_mb, q_am*q_mb, q_mb*t_am + p_am*t_mb
+
+
+## @brief Function to compute pi at a given precision.
+# @param prec number of significant digits
+# @return value of pi
+def _compute_pi(prec):
+    p, q, t = _pi_split(0, prec // 14 + 2)
+    return q * 426880 * Decimal(10005).sqrt() / t
+
+
+## @brief Function to compute the value of pi.
+# @return value of pi at the context precision
+# @details Computation using binary splitting of the Chudnovsky series
+# (about 14 digits per term).
+def pi():
+    return _cached_constant('pi', _compute_pi)
+
+
+## @brief Function to calculate arcus tangens of x.
+# @param x number
+# @return arctan of x in radians
+# @details Arguments above 1 are reflected with arctan(x) = pi/2 - arctan(1/x), then halved
+# with arctan(x) = 2*arctan(x / (1 + sqrt(1 + x*x))) until the Taylor series converges fast.
+def arctan(x):
+    x = _dec(x)
+    prec = decimal.getcontext().prec
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + 2*_GUARD
+        if x < 0:
+            result = -arctan(-x)
+        elif x > 1:
+            result = pi() / 2 - arctan(1 / x)
+        else:
+            halvings = 0
+            while x > Decimal('0.01'):
+                x = x / (1 + (1 + x*x).sqrt())
+                halvings += 1
+            eps = Decimal(10) ** -ctx.prec
+            result = term = x
+            x2 = x*x
+            n = 3
+            while abs(term) > eps:
+                term *= -x2
+                result += term / n
+                n += 2
+            result *= 2 ** halvings
+    return +result
+
+
+## @brief Function to calculate the square of a number.
+# @param a number
+# @return square of a
+def square(a):
+    return _dec(a) * a
+
+
+## @brief Function to calculate the power of a number.
+# @param a base
+# @param b exponent
+# @return a raised to the power of b
+def power(a,b):
+    return _dec(a) ** b
+
+
+## @brief Function to compute the square root of a number.
+# @param a number
+# @return square root of a
+# @details If a is negative, returns "Error".
+def sqrt(a):
+    a = _dec(a)
+    if a < 0:
+        return "Error"
+    return a.sqrt()
+
+
+## @brief Function to compute the nth root of a number.
+# @param a number
+# @param n root
+# @return nth root of a
+# @details Returns errors like math_lib.nthroot(); exact integer roots are returned exactly.
+def nthroot(a, n):
+    a = _dec(a)
+    if n == 0:
+        return "Error: Zeroth root is undefined"
+    if n % 2 == 0 and a < 0:
+        return "Error: Even root of negative number"
+    if a < 0:
+        return -nthroot(-a, n)
+    res = a ** (1 / _dec(n))
+    rint = res.to_integral_value()
+    if rint ** n == a:
+        return rint
+    return res
+
+
+## @brief Function to sum the series 2*atanh(y) = ln((1+y)/(1-y)).
+# @param y argument of the series, |y| < 1
+# @return value of the series at the context precision
+def _atanh_series(y):
+    eps = Decimal(10) ** -decimal.getcontext().prec
+    result = power = y
+    y2 = y*y
+    i = 3
+    while abs(power) > eps:
+        power *= y2
+        result += power / i
+        i += 2
+    return 2 * result
+
+
+## @brief Function to compute ln(10) at a given precision.
+# @param prec number of significant digits
+# @return value of ln(10)
+# @details ln(10) = 3*ln(2) + ln(5/4) with ln(2) = 2*atanh(1/3) and ln(5/4) = 2*atanh(1/9).
+def _compute_ln10(prec):
+    return 3*_atanh_series(Decimal(1) / 3) + _atanh_series(Decimal(1) / 9)
+
+
+## @brief Function to calculate the natural logarithm of a number.
+# @param a number
+# @return natural logarithm of a
+# @details The decimal exponent is split off with ln(m * 10**k) = ln(m) + k*ln(10), the mantissa
+# is brought close to 1 by repeated square roots and the atanh series is summed on the rest.
+# @details If a is less than or equal to 0, returns "Error".
+def ln(a):
+    a = _dec(a)
+    if a <= 0:
+        return "Error"
+    if a == 1:
+        return Decimal(0)
+    prec = decimal.getcontext().prec
+    roots = int(prec ** 0.5)
+    with decimal.localcontext() as ctx:
+        ctx.prec = prec + _GUARD + roots // 3
+        k = a.adjusted()
+        m = a.scaleb(-k)
+        for _ in range(roots):
+            m = m.sqrt()
+        result = _atanh_series((m - 1) / (m + 1)) * 2**roots
+        if k:
+            result += k * _cached_constant('ln10', _compute_ln10)
+    return +result
+
+
+## @brief Function to calculate the logarithm of a number with base b.
+# @param a number
+# @param b base
+# @return logarithm of a with base b
+def log(a,b):
+    if a <= 0 or b <= 0 or b == 1:
+        return "Error"
+    with decimal.localcontext() as ctx:
+        ctx.prec += _GUARD
+        result = ln(a) / ln(b)
+    return +result
+
+
+## @brief Function to calculate the absolute value of a number.
+# @param a number
+# @return absolute value of a
+def abs(a):
+    return -a if a < 0 else a
+
+
+## @brief Function to calculate sine and cosine of a reduced angle.
+# @param rad angle in radians, |rad| <= pi/4
+# @return tuple (sine, cosine) at the context precision
+def _sincos_series(rad):
+    eps = Decimal(10) ** -decimal.getcontext().prec
+    r2 = rad*rad
+    s = term = rad
+    n = 1
+    while abs(term) > eps:
+        term *= -r2 / ((n + 1) * (n + 2))
+        s += term
+        n += 2
+    c = term = Decimal(1)
+    n = 0
+    while abs(term) > eps:
+        term *= -r2 / ((n + 1) * (n + 2))
+        c += term
+        n += 2
+    return s, c
+
+
+## @brief Function to calculate the sine and cosine of an angle in degrees in one pass.
+# @param x angle in degrees
+# @return tuple (sine of x, cosine of x)
+# @details Same quadrant reduction as math_lib.sincos(); exact multiples of 90 degrees
+# give exact results.
+def sincos(x):
+    x = _dec(x)
+    with decimal.localcontext() as ctx:
+        ctx.prec += _GUARD
+        quadrant = (x / 90).to_integral_value(decimal.ROUND_HALF_EVEN)
+        s, c = _sincos_series((x - 90*quadrant) * pi() / 180)
+    quadrant = int(quadrant) % 4
+    if quadrant == 1:
+        s, c = c, -s
+    elif quadrant == 2:
+        s, c = -s, -c
+    elif quadrant == 3:
+        s, c = -c, s
+    return +s, +c
+
+
+## @brief Function to calculate the sine of an angle in degrees.
+# @param x angle in degrees
+# @return sine of x
+def sin(x):
+    return sincos(x)[0]
+
+
+## @brief Function to calculate the cosine of an angle in degrees.
+# @param x angle in degrees
+# @return cosine of x
+def cos(x):
+    return sincos(x)[1]
+
+
+## @brief Function to calculate the tangent of an angle in degrees.
+# @param x angle in degrees
+# @return tangent of x
+# @details If the cosine is 0, returns "Error".
+def tg(x):
+    sin_x, cos_x = sincos(x)
+    if cos_x == 0:
+        return "Error"
+    return sin_x / cos_x
+
+
+## @brief Function to calculate the cotangent of an angle in degrees.
+# @param x angle in degrees
+# @return cotangent of x
+# @details If the sine is 0, returns "Error".
+def cotg(x):
+    sin_x, cos_x = sincos(x)
+    if sin_x == 0:
+        return "Error"
+    return cos_x / sin_x
+
+
+## @brief Function to calculate the sum of a list of numbers.
+# @param numbers list of numbers
+# @return sum of numbers
+def sum(numbers):
+    total = Decimal(0)
+    for num in numbers:
+        total += num
+    return total
+
+# end of math_lib_decimal.py
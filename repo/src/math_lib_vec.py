@@ -0,0 +1,284 @@
+## @file math_lib_vec.py
+# @brief NumPy-vectorized variants of the functions in math_lib.
+# @details Every function takes array-like arguments and returns a float64 ndarray,
+# evaluated element-wise in one pass. Elements for which the scalar function in math_lib
+# returns "Error" are set to NaN instead, see is_error().
+# Results agree with the scalar functions within a relative tolerance of TOLERANCE
+# (or an absolute tolerance of TOLERANCE near zero); values that the scalar functions
+# return as exact integers stay exact as long as they fit into a float64.
+# The module is also available as math_lib.vec.
+# @date 2025-05-06
+
+import numpy as np
+import math_lib as math
+
+## @brief Documented tolerance between vectorized and scalar results.
+TOLERANCE = 1e-12
+
+## @var _FACT_TABLE
+# factorials that fit into a float64, _FACT_TABLE[k] == k!
+_FACT_TABLE = np.array([float(math.fact(k)) for k in range(171)])
+
+
+## @brief Function to convert an argument to a float64 array.
+# @param a array-like argument
+# @return float64 ndarray
+def _array(a):
+    return np.asarray(a, dtype=np.float64)
+
+
+## @brief Function to round near-integers to integers element-wise.
+# @param val ndarray of values
+# @param precision maximal distance from an integer that is snapped
+# @return ndarray with snapped values
+def _snap_to_integer(val, precision):
+    nearest = np.rint(val)
+    return np.where(np.abs(val - nearest) < precision, nearest, val)
+
+
+## @brief Function to mark errors in a vectorized result.
+# @param values ndarray returned by a function of this module
+# @return boolean ndarray, True where the scalar function returns "Error"
+def is_error(values):
+    return np.isnan(values)
+
+
+## @brief Function to add arrays element-wise.
+# @param a first array
+# @param b second array
+# @return sum
+def add(a,b):
+    return np.add(_array(a), _array(b))
+
+
+## @brief Function to subtract arrays element-wise.
+# @param a first array
+# @param b second array
+# @return difference
+def sub(a,b):
+    return np.subtract(_array(a), _array(b))
+
+
+## @brief Function to multiply arrays element-wise.
+# @param a first array
+# @param b second array
+# @return product
+def mul(a,b):
+    return np.multiply(_array(a), _array(b))
+
+
+## @brief Function to divide arrays element-wise.
+# @param a first array
+# @param b second array
+# @return quotient, NaN where b is 0
+def div(a,b):
+    a, b = np.broadcast_arrays(_array(a), _array(b))
+    out = np.full(a.shape, np.nan)
+    np.divide(a, b, out=out, where=(b != 0))
+    return out
+
+
+## @brief Function to calculate factorials element-wise.
+# @param n array of numbers
+# @return factorials, NaN where n is negative or not an integer
+# @details Factorials above 170! overflow a float64 and are returned as inf.
+def fact(n):
+    n = _array(n)
+    valid = (n >= 0) & (n == np.floor(n))
+    index = np.where(valid, np.minimum(n, len(_FACT_TABLE) - 1), 0).astype(np.intp)
+    out = np.where(n < len(_FACT_TABLE), _FACT_TABLE[index], np.inf)
+    return np.where(valid, out, np.nan)
+
+
+## @brief Function to compute the value of Euler's number.
+# @param precision number of terms of the series
+# @return value of euler's number
+def compute_e(precision=20):
+    return np.float64(math.compute_e(precision))
+
+
+## @brief Function to calculate arcus tangens element-wise.
+# @param x array of numbers
+# @param precision accepted for compatibility with math_lib.arctan()
+# @return arctan of x
+# @details Uses np.arctan, which also converges for |x| > 1.
+def arctan(x, precision=1e-17):
+    return np.arctan(_array(x))
+
+
+## @brief Function to compute the value of pi.
+# @param precision precision of the series
+# @return value of pi
+def pi(precision=1e-17):
+    return np.float64(math.pi(precision))
+
+
+## @brief Function to square arrays element-wise.
+# @param a array of numbers
+# @return square of a
+def square(a):
+    a = _array(a)
+    return a*a
+
+
+## @brief Function to raise arrays to powers element-wise.
+# @param a array of bases
+# @param b array of exponents
+# @return a raised to the power of b, NaN where the result is not real
+def power(a,b):
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        return np.power(_array(a), _array(b))
+
+
+## @brief Function to compute square roots element-wise.
+# @param a array of numbers
+# @return square root of a, NaN where a is negative
+# @details Rounded to 10 decimal places and snapped to integers like math_lib.sqrt().
+def sqrt(a):
+    a = _array(a)
+    with np.errstate(invalid='ignore'):
+        res = np.round(np.sqrt(a), 10)
+    rint = np.round(res)
+    return np.where(np.abs(rint*rint - a) < 1e-10, rint, res)
+
+
+## @brief Function to compute nth roots element-wise.
+# @param a array of numbers
+# @param n array of roots
+# @return nth root of a, NaN where n is 0 or where a is negative and n is even
+def nthroot(a,n):
+    a, n = np.broadcast_arrays(_array(a), _array(n))
+    valid = (n != 0) & ~((np.mod(n, 2) == 0) & (a < 0))
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        res = np.sign(a) * np.abs(a) ** (1 / n)
+        rint = np.round(res)
+        res = np.where(np.abs(rint ** n - a) < 1e-10, rint, res)
+    return np.where(valid, res, np.nan)
+
+
+## @brief Function to calculate natural logarithms element-wise.
+# @param a array of numbers
+# @param precision precision of the last summed term
+# @return natural logarithm of a, NaN where a is less than or equal to 0
+# @details Same reduction as math_lib.ln(): ln(m * 2**k) = ln(m) + k*ln(2) with the
+# mantissa in [sqrt(1/2), sqrt(2)), followed by the atanh series summed until the
+# largest term of the whole array drops below precision.
+def ln(a, precision=1e-20):
+    a = _array(a)
+    valid = a > 0
+    m, k = np.frexp(np.where(valid, a, 1.0))
+    low = m < 0.7071067811865476
+    m = np.where(low, 2*m, m)
+    k = np.where(low, k - 1, k)
+    y = (m - 1) / (m + 1)
+    y2 = y*y
+    result = np.zeros_like(y)
+    power = y
+    i = 1
+    while True:
+        term = power / i
+        if not np.any(np.abs(term) > precision):
+            break
+        result += term
+        power = power * y2
+        i += 2
+    result = np.where(a == 1, 0.0, 2*result + k*math._ln2(precision))
+    return np.where(valid, result, np.nan)
+
+
+## @brief Function to calculate logarithms with base b element-wise.
+# @param a array of numbers
+# @param b array of bases
+# @return logarithm of a with base b, NaN where math_lib.log() returns "Error"
+def log(a,b):
+    a, b = np.broadcast_arrays(_array(a), _array(b))
+    valid = (a > 0) & (b > 0) & (b != 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        res = ln(a) / ln(b)
+    return np.where(valid, res, np.nan)
+
+
+## @brief Function to calculate absolute values element-wise.
+# @param a array of numbers
+# @return absolute value of a
+def abs(a):
+    return np.abs(_array(a))
+
+
+## @brief Function to evaluate a polynomial in r2 by the Horner scheme in place.
+# @param r2 ndarray of arguments
+# @param coeffs coefficients from the lowest power
+# @return ndarray of values
+def _horner(r2, coeffs):
+    res = np.full_like(r2, coeffs[-1])
+    for coeff in reversed(coeffs[:-1]):
+        res *= r2
+        res += coeff
+    return res
+
+
+## @brief Function to calculate sines and cosines of angles in degrees element-wise.
+# @param x array of angles in degrees
+# @param precision precision of snapping results to integers
+# @return tuple (sine of x, cosine of x)
+# @details Same quadrant reduction and polynomial kernel as math_lib.sincos().
+def sincos(x, precision=1e-17):
+    x = np.remainder(_array(x), 360)
+    quadrant = np.rint(x / 90)
+    rad = x - 90*quadrant
+    rad *= math.pi()
+    rad /= 180
+    r2 = rad*rad
+    s = _horner(r2, math._SIN_COEFFS)
+    s *= rad
+    c = _horner(r2, math._COS_COEFFS)
+    quadrant = quadrant.astype(np.int8) & 3
+    swap = (quadrant & 1).astype(bool)
+    sin_x = np.where(swap, c, s)
+    cos_x = np.where(swap, s, c)
+    np.negative(sin_x, out=sin_x, where=(quadrant >= 2))
+    np.negative(cos_x, out=cos_x, where=(quadrant == 1) | (quadrant == 2))
+    return _snap_to_integer(sin_x, precision), _snap_to_integer(cos_x, precision)
+
+
+## @brief Function to calculate sines of angles in degrees element-wise.
+# @param x array of angles in degrees
+# @param precision precision of snapping results to integers
+# @return sine of x
+def sin(x, precision=1e-17):
+    return sincos(x, precision)[0]
+
+
+## @brief Function to calculate cosines of angles in degrees element-wise.
+# @param x array of angles in degrees
+# @param precision precision of snapping results to integers
+# @return cosine of x
+def cos(x, precision=1e-17):
+    return sincos(x, precision)[1]
+
+
+## @brief Function to calculate tangents of angles in degrees element-wise.
+# @param x array of angles in degrees
+# @param precision precision of snapping results to integers
+# @return tangent of x, NaN where the cosine is 0
+def tg(x, precision=1e-10):
+    sin_x, cos_x = sincos(x, precision)
+    return div(sin_x, cos_x)
+
+
+## @brief Function to calculate cotangents of angles in degrees element-wise.
+# @param x array of angles in degrees
+# @param precision precision of snapping results to integers
+# @return cotangent of x, NaN where the sine is 0
+def cotg(x, precision=1e-10):
+    sin_x, cos_x = sincos(x, precision)
+    return div(cos_x, sin_x)
+
+
+## @brief Function to calculate the sum of an array of numbers.
+# @param numbers array of numbers
+# @return sum of numbers
+def sum(numbers):
+    return np.sum(_array(numbers))
+
+# end of math_lib_vec.py
@@ -0,0 +1,473 @@
+## @file server.py
+# @brief Long-lived evaluation server wrapping calculator.evaluate().
+# @details Listens on a Unix socket or a local TCP port and speaks a line-delimited JSON
+# protocol. Every request line is an object, every response line echoes its "id":
+#
+#   {"id": 1, "expr": "1+2", "base": 10, "digits": null, "timeout": 5}
+#   -> {"id": 1, "result": "3"}
+#   {"id": 2, "expr": "sin(1)", "digits": 20000, "timeout": 0.5}
+#   -> {"id": 2, "error": "timeout"}
+#   {"id": 3, "op": "stats"}
+#   -> {"id": 3, "stats": {"queue_depth": 0, "requests": 2, ...}}
+#
+# Only "expr" is required. Invalid expressions give the result "Error" like evaluate().
+# Requests are evaluated in a pool of worker processes. Requests that arrive close together
+# are sent to a worker as one batch, and the workers keep their parse caches warm between
+# batches. The worker sends back the result of every request of a batch as soon as it is
+# computed, so a slow request does not hold back the others. A request that is not answered
+# within its timeout gets the error "timeout"; if its batch is still running after the
+# deadline, the workers are restarted so that runaway work does not block the pool, and the
+# unanswered requests lost with them are sent again. The workers evaluate with a
+# calculator.Budget whose time limit is the request timeout, so most over-budget requests
+# stop by themselves and get the result calculator.BUDGET_ERROR.
+#
+# Usage:
+#   python3 server.py [--unix PATH | --host HOST --port PORT] [--workers N]
+#                     [--batch-delay MS] [--max-batch N] [--timeout S]
+#                     [--max-bits N] [--max-exponent X] [--max-fact N]
+# @date 2025-05-20
+
+import argparse
+import asyncio
+import collections
+import functools
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import calculator
+
+## @brief Default time a request may wait for its result, in seconds.
+DEFAULT_TIMEOUT = 5.0
+
+## @brief Default time a batch waits for more requests, in seconds.
+DEFAULT_BATCH_DELAY = 0.002
+
+## @brief Default largest number of requests in a batch.
+DEFAULT_MAX_BATCH = 64
+
+## @brief Number of latest latencies kept for the statistics.
+LATENCY_WINDOW = 4096
+
+
+## @var _channel
+# tuple (lock, connection) through which a worker process sends results, see _init_worker()
+_channel = None
+
+
+## @brief Function to initialize a worker process.
+# @param lock lock serializing the messages of the workers of a pool
+# @param conn writing end of the result pipe of the pool
+def _init_worker(lock, conn):
+    global _channel
+    _channel = (lock, conn)
+
+
+## @brief Function to evaluate a batch of requests in a worker process.
+# @param key key of the batch
+# @param items list of tuples (expression, base, digits, budget)
+# @details Every result is sent through the result pipe as (key, index, result) as soon as it
+# is computed; (key, None, None) marks the end of the batch.
+def _evaluate_batch(key, items):
+    lock, conn = _channel
+    for i, item in enumerate(items):
+        result = calculator.evaluate(*item)
+        with lock:
+            conn.send((key, i, result))
+    with lock:
+        conn.send((key, None, None))
+
+
+## @brief Function to receive results from the workers of a pool in a thread.
+# @param conn reading end of the result pipe of the pool
+# @param loop event loop of the server
+# @param deliver function called in the loop with every list of messages received together
+# @details Returns when all writing ends of the pipe are closed, i.e. when the pool is gone.
+def _receive_results(conn, loop, deliver):
+    try:
+        while True:
+            messages = [conn.recv()]
+            while conn.poll():
+                messages.append(conn.recv())
+            loop.call_soon_threadsafe(deliver, messages)
+    except (EOFError, OSError, RuntimeError):
+        pass
+    finally:
+        conn.close()
+
+
+## @brief Class describing a request waiting for its result.
+class _Pending:
+
+    ## @brief Constructor for the _Pending class.
+    # @param args arguments of calculator.evaluate()
+    # @param future future receiving the result
+    # @param deadline loop time at which the request times out
+    def __init__(self, args, future, deadline):
+        self.args = args
+        self.future = future
+        self.deadline = deadline
+
+
+## @brief Class of the evaluation server.
+class CalculatorServer:
+
+    ## @brief Constructor for the CalculatorServer class.
+    # @param workers number of worker processes, by default the number of CPUs
+    # @param batch_delay time a batch waits for more requests, in seconds
+    # @param max_batch largest number of requests in a batch
+    # @param timeout default time a request may wait for its result, in seconds
+    # @param budget optional calculator.Budget with the size limits of every evaluation;
+    # its time limit is replaced by the timeout of the request
+    def __init__(self, workers=None, batch_delay=DEFAULT_BATCH_DELAY,
+                 max_batch=DEFAULT_MAX_BATCH, timeout=DEFAULT_TIMEOUT, budget=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_delay = batch_delay
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.budget = budget or calculator.Budget()
+        self._pool = None
+        self._writer = None
+        self._batches = {}
+        self._keys = itertools.count()
+        self._queue = None
+        self._slots = None
+        self._batcher = None
+        self._in_flight = 0
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self._counters = collections.Counter()
+
+    ## @brief Function to start the worker pool and the batcher.
+    # @details Called by serve() and by the asynchronous context manager.
+    async def start(self):
+        self._start_pool()
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+    ## @brief Function to stop the batcher and the worker pool.
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._writer.close()
+            self._pool = self._writer = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    ## @brief Function to evaluate an expression in the worker pool.
+    # @param expr input expression
+    # @param base base for number conversion (2, 8, or 10)
+    # @param digits number of significant digits, see calculator.evaluate()
+    # @param timeout time to wait for the result in seconds, None for the default timeout
+    # @return result as a string
+    # @details Raises asyncio.TimeoutError if the result is not ready in time.
+    async def evaluate(self, expr, base=10, digits=None, timeout=None):
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        start = loop.time()
+        budget = self.budget._replace(time=timeout)
+        pending = _Pending((expr, base, digits, budget), loop.create_future(), start + timeout)
+        self._queue.put_nowait(pending)
+        self._counters['requests'] += 1
+        try:
+            return await asyncio.wait_for(pending.future, timeout)
+        except asyncio.TimeoutError:
+            self._counters['timeouts'] += 1
+            raise
+        finally:
+            self._latencies.append(loop.time() - start)
+
+    ## @brief Function to get the statistics of the server.
+    # @return dictionary with the queue depth, counters and latencies in milliseconds
+    # @details Latencies are computed over the latest LATENCY_WINDOW requests.
+    def stats(self):
+        latencies = sorted(self._latencies)
+        batches = self._counters['batches']
+
+        def percentile(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e3, 3)
+
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'in_flight': self._in_flight,
+            'requests': self._counters['requests'],
+            'timeouts': self._counters['timeouts'],
+            'batches': batches,
+            'mean_batch_size': round(self._counters['batched'] / batches, 2) if batches else 0,
+            'worker_restarts': self._counters['restarts'],
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies) * 1e3, 3),
+                'p50': percentile(0.5),
+                'p99': percentile(0.99),
+                'max': round(latencies[-1] * 1e3, 3),
+            } if latencies else None,
+        }
+
+    ## @brief Function to collect requests into batches and send them to the workers.
+    # @details A batch is started when a worker is free. It takes the first waiting
+    # request and the requests arriving within batch_delay, at most max_batch of them.
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            end = loop.time() + self.batch_delay
+            while len(batch) < self.max_batch:
+                if self._queue.empty():
+                    remaining = end - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self._queue.get_nowait())
+            batch = [item for item in batch if not item.future.done()]
+            if not batch:
+                self._slots.release()
+                continue
+            self._counters['batches'] += 1
+            self._counters['batched'] += len(batch)
+            self._in_flight += 1
+            asyncio.create_task(self._run_batch(batch))
+
+    ## @brief Function to evaluate a batch in the worker pool and deliver the results.
+    # @param batch list of pending requests
+    # @details Results are delivered by _deliver() as the worker sends them. If the batch is
+    # still running at the earliest deadline of its unanswered requests, the workers are
+    # restarted. The unanswered requests of a batch lost because the workers were restarted
+    # are sent again as long as their deadlines allow.
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                batch = [item for item in batch
+                         if not item.future.done() and item.deadline > loop.time()]
+                if not batch:
+                    break
+                key = next(self._keys)
+                finished = loop.create_future()
+                self._batches[key] = (batch, finished)
+                pool = self._pool
+                try:
+                    work = pool.submit(_evaluate_batch, key, [item.args for item in batch])
+                    work.add_done_callback(functools.partial(self._batch_done, loop, finished))
+                    while not finished.done():
+                        unanswered = [item.deadline for item in batch if not item.future.done()]
+                        timeout = min(unanswered) - loop.time() if unanswered else None
+                        await asyncio.wait([finished], timeout=timeout)
+                        if not finished.done() and unanswered and loop.time() >= min(unanswered):
+                            self._restart_pool(pool)
+                            await asyncio.wait([finished])
+                    finished.result()
+                    break
+                except BrokenProcessPool:
+                    self._restart_pool(pool)
+                finally:
+                    del self._batches[key]
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+        for item in batch:
+            if not item.future.done():
+                item.future.set_exception(asyncio.TimeoutError())
+
+    ## @brief Function to deliver results sent by the workers.
+    # @param messages list of tuples (key of the batch, index of the request in the batch or
+    # None at the end of the batch, result)
+    def _deliver(self, messages):
+        for key, index, result in messages:
+            if key not in self._batches:
+                continue
+            batch, finished = self._batches[key]
+            if index is None:
+                if not finished.done():
+                    finished.set_result(None)
+            elif not batch[index].future.done():
+                batch[index].future.set_result(result)
+
+    ## @brief Function to pass the failure of a batch to the server.
+    # @param loop event loop of the server
+    # @param finished future of the end of the batch
+    # @param work concurrent future of the batch
+    # @details Called in a thread of the pool; a batch that ends normally is finished by
+    # the message of its end, which comes after all its results.
+    @staticmethod
+    def _batch_done(loop, finished, work):
+        if work.cancelled() or work.exception() is None:
+            return
+        def fail():
+            if not finished.done():
+                finished.set_exception(work.exception())
+        loop.call_soon_threadsafe(fail)
+
+    ## @brief Function to start a worker pool with its result pipe.
+    def _start_pool(self):
+        context = multiprocessing.get_context()
+        reader, self._writer = context.Pipe(duplex=False)
+        self._pool = ProcessPoolExecutor(self.workers, context, initializer=_init_worker,
+                                         initargs=(context.Lock(), self._writer))
+        threading.Thread(target=_receive_results, daemon=True,
+                         args=(reader, asyncio.get_running_loop(), self._deliver)).start()
+
+    ## @brief Function to replace the worker pool, killing its processes.
+    # @param pool pool to replace; nothing is done if it was already replaced
+    def _restart_pool(self, pool):
+        if pool is not self._pool:
+            return
+        self._counters['restarts'] += 1
+        # closed before the next pool forks its workers, so that the old pipe reaches EOF
+        self._writer.close()
+        self._start_pool()
+        # ProcessPoolExecutor cannot cancel running work, so the busy workers are terminated
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    ## @brief Function to answer one request line.
+    # @param line request line
+    # @return response object
+    async def handle_request(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be an object")
+        except ValueError as err:
+            return {'id': None, 'error': f"invalid request: {err}"}
+        response = {'id': request.get('id')}
+        op = request.get('op', 'evaluate')
+        if op == 'stats':
+            response['stats'] = self.stats()
+        elif op != 'evaluate':
+            response['error'] = f"unknown op {op!r}"
+        elif not isinstance(request.get('expr'), str):
+            response['error'] = "invalid request: expr must be a string"
+        elif request.get('base', 10) not in (2, 8, 10):
+            response['error'] = "invalid request: base must be 2, 8 or 10"
+        elif request.get('digits') is not None and \
+                (not isinstance(request['digits'], int) or request['digits'] < 1):
+            response['error'] = "invalid request: digits must be a positive integer"
+        elif request.get('timeout') is not None and \
+                (type(request['timeout']) not in (int, float) or
+                 not 0 < request['timeout'] < math.inf):
+            response['error'] = "invalid request: timeout must be a positive number"
+        else:
+            try:
+                response['result'] = await self.evaluate(
+                    request['expr'], request.get('base', 10), request.get('digits'),
+                    request.get('timeout'))
+            except asyncio.TimeoutError:
+                response['error'] = "timeout"
+            except Exception as err:
+                response['error'] = f"internal error: {err}"
+        return response
+
+    ## @brief Function to serve one client connection.
+    # @param reader stream reader of the connection
+    # @param writer stream writer of the connection
+    # @details Requests of a connection are evaluated concurrently, so responses may come
+    # in a different order than the requests.
+    async def handle_client(self, reader, writer):
+        tasks = set()
+
+        async def answer(line):
+            try:
+                response = await self.handle_request(line)
+            except Exception as err:
+                response = {'id': None, 'error': f"internal error: {err}"}
+            try:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    ## @brief Function to listen for clients until cancelled.
+    # @param path path of the Unix socket; if None, TCP is used
+    # @param host TCP host
+    # @param port TCP port
+    # @param ready optional callback receiving the listening asyncio.Server
+    async def serve(self, path=None, host='127.0.0.1', port=8765, ready=None):
+        async with self:
+            if path is not None:
+                server = await asyncio.start_unix_server(self.handle_client, path)
+            else:
+                server = await asyncio.start_server(self.handle_client, host, port)
+            async with server:
+                if ready is not None:
+                    ready(server)
+                await server.serve_forever()
+
+
+## @brief Main entry point of the server.
+# @param argv command line arguments
+# @return exit status
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluation server for the calculator.")
+    parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket")
+    parser.add_argument('--host', default='127.0.0.1', help="TCP host (default 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="TCP port (default 8765)")
+    parser.add_argument('--workers', type=int, help="number of worker processes")
+    parser.add_argument('--batch-delay', type=float, default=DEFAULT_BATCH_DELAY * 1e3,
+                        help="time a batch waits for more requests in ms (default 2)")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help="largest number of requests in a batch (default 64)")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help="default request timeout in seconds (default 5)")
+    parser.add_argument('--max-bits', type=int, help="largest bit length of integer results")
+    parser.add_argument('--max-exponent', type=float, help="largest absolute exponent")
+    parser.add_argument('--max-fact', type=int, help="largest factorial argument")
+    args = parser.parse_args(argv)
+
+    budget = calculator.Budget(None, args.max_bits, args.max_exponent, args.max_fact)
+    server = CalculatorServer(args.workers, args.batch_delay / 1e3, args.max_batch,
+                              args.timeout, budget)
+
+    def ready(listener):
+        where = args.unix or f"{args.host}:{listener.sockets[0].getsockname()[1]}"
+        print(f"Listening on {where}.", file=sys.stderr)
+
+    try:
+        asyncio.run(server.serve(args.unix, args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# end of server.py
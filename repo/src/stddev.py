@@ -1,63 +1,495 @@
 ## @file stddev.py
-# @brief Calculates the standard deviation of a series of numbers provided via standard input (stdin).
-# It processes the input, calculates the mean, sum of squares, and the standard deviation.
-# The result is printed to stdout.
+# @brief Calculates the standard deviation of a series of numbers provided via standard input (stdin)
+# or read from files.
+# It reads the input in a single pass in large binary blocks, parses every block at once and
+# accumulates the count, mean and sum of squared deviations of the blocks, so memory use does
+# not grow with the input and large offsets do not cost precision. The result is printed to stdout.
 # The script expects input in the form of whitespace-separated numbers (multiple lines allowed).
+# Files are memory-mapped and parsed straight from the mapping; the numbers of all given files
+# are combined into one result. Large files can be split into byte ranges summarized in
+# parallel by worker processes. Besides text, the input can be raw little-endian float64
+# values or a .npy file of float64 values, which are summarized straight from the mapping
+# without parsing; by default .npy files are detected by their magic string and raw files
+# by the extension .f64, everything else is read as text. If NumPy is installed, it sums the
+# squared deviations of every block, see Accumulator.update_block().
+#
+# Usage:
+#   python3 stddev.py [--file PATH [PATH ...]] [--workers N] [--format {auto,text,f64,npy}]
 # @date 2025-04-28
 
+import argparse
+import ast
+import glob
+import mmap
+import os
+import re
+import stat
 import sys
+from array import array
+from math import fsum, prod
 import math_lib as math
 
+## @brief Number of bytes of input read and parsed at once.
+BLOCK_SIZE = 1 << 18
+
+## @brief Smallest number of bytes of a file summarized by one worker process.
+MIN_RANGE_SIZE = 1 << 22
+
+## @var _SPACE_RE
+# regular expression of the whitespace bytes that separate numbers, see bytes.split()
+_SPACE_RE = re.compile(rb"\s")
+
+## @brief Input formats, see main().
+FORMATS = ('auto', 'text', 'f64', 'npy')
+
+## @brief Magic string at the start of .npy files.
+_NPY_MAGIC = b'\x93NUMPY'
+
+## @brief File name extensions of raw little-endian float64 files.
+RAW_EXTENSIONS = ('.f64',)
+
+
+## @var _np
+# numpy module, False if it is not importable, None until the first call of _numpy()
+_np = None
+
+
+## @brief Function to import NumPy on first use.
+# @return numpy module, None if it is not installed
+# @details NumPy is optional; it is imported only once a block of numbers is summarized.
+def _numpy():
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = False
+    return _np or None
+
+
+## @brief Class accumulating the statistics of a stream of numbers.
+# @details Keeps the count, the mean and M2, the sum of squared deviations from the mean,
+# without keeping the numbers. Single numbers are added by Welford's algorithm, blocks of
+# numbers are summarized exactly and merged by Chan's algorithm.
+class Accumulator:
+
+    ## @brief Constructor for the Accumulator class.
+    # @param count number of accumulated numbers
+    # @param mean mean of the accumulated numbers
+    # @param m2 sum of squared deviations from the mean
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    ## @brief Function to add numbers to the accumulator.
+    # @param numbers iterable of numbers
+    def update(self, numbers):
+        count, mean, m2 = self.count, self.mean, self.m2
+        for x in numbers:
+            count += 1
+            delta = x - mean
+            mean += delta / count
+            m2 += delta * (x - mean)
+        self.count, self.mean, self.m2 = count, mean, m2
+
+    ## @brief Function to add a block of numbers to the accumulator.
+    # @param block sequence of numbers, e.g. an array('d')
+    # @details The squared deviations are summed by NumPy if it is importable, otherwise
+    # in a Python loop, which takes about five times as long as the exact sum of the block.
+    def update_block(self, block):
+        count = len(block)
+        if count:
+            mean = fsum(block) / count
+            np = _numpy()
+            if np is None:
+                m2 = fsum((x - mean) * (x - mean) for x in block)
+            else:
+                deviations = np.asarray(block, dtype=np.float64) - mean
+                m2 = float(np.dot(deviations, deviations))
+            self.merge(count, mean, m2)
+
+    ## @brief Function to merge the statistics of other numbers into the accumulator.
+    # @param count number of the other numbers
+    # @param mean mean of the other numbers
+    # @param m2 sum of squared deviations of the other numbers from their mean
+    def merge(self, count, mean, m2):
+        total = self.count + count
+        if total == 0:
+            return
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    ## @brief Function to calculate the sample standard deviation of the accumulated numbers.
+    # @return standard deviation
+    def stddev(self):
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+## @brief Function to read numbers from a binary stream in blocks.
+# @param stream binary stream of whitespace-separated numbers
+# @param block_size number of bytes read at once
+# @param size number of bytes to read, None to read until EOF
+# @return generator of array('d') blocks of numbers
+# @details A number cut by the end of a block is carried over to the next one.
+# Exits with status 1 on invalid input.
+def read_blocks(stream, block_size=BLOCK_SIZE, size=None):
+    tail = b''
+    while size is None or size > 0:
+        block = stream.read(block_size if size is None else min(block_size, size))
+        if not block:
+            break
+        if size is not None:
+            size -= len(block)
+        block = tail + block
+        tokens = block.split()
+        tail = tokens.pop() if tokens and not block[-1:].isspace() else b''
+        yield _parse(tokens)
+    if tail:
+        yield _parse([tail])
+
+
+## @brief Function to detect the format of an input.
+# @param sample bytes at the start of the input
+# @param path path of the input file, None for stdin
+# @return 'npy' for the .npy magic string, 'f64' for a file with one of RAW_EXTENSIONS,
+# otherwise 'text'
+# @details The content of text input is not inspected, so invalid text, e.g. with control
+# characters, is reported as invalid input instead of being read as binary numbers.
+def detect_format(sample, path=None):
+    if sample.startswith(_NPY_MAGIC):
+        return 'npy'
+    if path is not None and os.path.splitext(path)[1].lower() in RAW_EXTENSIONS:
+        return 'f64'
+    return 'text'
+
+
+## @brief Function to read numbers from a binary stream in any format.
+# @param stream binary stream
+# @param fmt format of the input, one of FORMATS
+# @param block_size number of bytes read at once
+# @return generator of blocks of numbers
+def read_stream_blocks(stream, fmt='auto', block_size=BLOCK_SIZE):
+    if fmt == 'auto':
+        fmt = detect_format(_peek(stream))
+    if fmt == 'text':
+        return read_blocks(stream, block_size)
+    return read_binary_blocks(stream, fmt, block_size)
+
+
+## @brief Function to get the start of a stream without consuming it.
+# @param stream binary stream, buffered or seekable
+# @return bytes enough to detect the format, fewer if the stream is shorter
+def _peek(stream):
+    if hasattr(stream, 'peek'):
+        return stream.peek(len(_NPY_MAGIC))[:len(_NPY_MAGIC)]
+    pos = stream.tell()
+    sample = stream.read(len(_NPY_MAGIC))
+    stream.seek(pos)
+    return sample
+
+
+## @brief Function to read float64 values from a binary stream in blocks.
+# @param stream binary stream of raw little-endian float64 values or of a .npy file
+# @param fmt 'f64' or 'npy'
+# @param block_size number of bytes read at once
+# @return generator of array('d') blocks of numbers
+# @details Exits with status 1 on invalid input.
+def read_binary_blocks(stream, fmt, block_size=BLOCK_SIZE):
+    count = _npy_header(stream) if fmt == 'npy' else None
+    block_size -= block_size % 8
+    total = 0
+    tail = b''
+    while True:
+        chunk = stream.read(block_size)
+        if not chunk:
+            break
+        chunk = tail + chunk
+        cut = len(chunk) - len(chunk) % 8
+        tail = chunk[cut:]
+        block = array('d')
+        block.frombytes(memoryview(chunk)[:cut])
+        if sys.byteorder != 'little':
+            block.byteswap()
+        total += len(block)
+        yield block
+    if tail or count is not None and total != count:
+        _invalid_input()
+
+
+## @brief Function to read the header of a .npy file.
+# @param stream binary stream positioned at the start of the file
+# @return number of float64 values following the header
+# @details Only little-endian float64 arrays are accepted, in any order and shape.
+# Exits with status 1 on invalid input.
+def _npy_header(stream):
+    try:
+        prefix = stream.read(8)
+        if prefix[:6] != _NPY_MAGIC:
+            raise ValueError("not a .npy file")
+        length = stream.read(2 if prefix[6] == 1 else 4)
+        header = ast.literal_eval(stream.read(int.from_bytes(length, 'little')).decode('latin-1'))
+        if header['descr'] != '<f8':
+            raise ValueError("not a float64 array")
+        return prod(header['shape'])
+    except Exception:
+        _invalid_input()
+
+
+## @brief Function to find the float64 values of a memory-mapped binary input.
+# @param data mmap of the input
+# @param fmt 'f64' or 'npy'
+# @return tuple (start, end) of the byte range of the values
+# @details Exits with status 1 on invalid input.
+def _binary_range(data, fmt):
+    start, end = 0, len(data)
+    if fmt == 'npy':
+        data.seek(0)
+        count = _npy_header(data)
+        start = data.tell()
+        end = start + 8 * count
+    if end > len(data) or (end - start) % 8:
+        _invalid_input()
+    return start, end
+
+
+## @brief Function to read numbers from a file in blocks.
+# @param path path of the file
+# @param block_size number of bytes parsed at once
+# @param start offset of the first byte to read
+# @param end offset after the last byte to read, None to read the whole input
+# @param fmt format of the input, one of FORMATS
+# @return generator of blocks of numbers, see read_blocks()
+# @details The file is memory-mapped, so it is parsed without a copy through a pipe or a file
+# buffer; files that cannot be mapped, e.g. empty files or pipes, are read as streams.
+# Binary blocks are memoryview slices of the mapping, so float64 values are not copied at all.
+def read_file_blocks(path, block_size=BLOCK_SIZE, start=0, end=None, fmt='text'):
+    size = None if end is None else end - start
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            if fmt == 'auto':
+                fmt = detect_format(_peek(f), path)
+            if fmt == 'text':
+                yield from read_blocks(f, block_size, size)
+            else:
+                yield from read_stream_blocks(f, fmt, block_size)
+            return
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            data.madvise(mmap.MADV_SEQUENTIAL)
+        if fmt == 'auto':
+            fmt = detect_format(data[:len(_NPY_MAGIC)], path)
+        if fmt != 'text':
+            # the mapping is released with the last block referring to it, not closed here
+            yield from _mapped_blocks(data, fmt, block_size, start, end)
+            return
+        with data:
+            data.seek(start)
+            yield from read_blocks(data, block_size, size)
+
+
+## @brief Function to slice the float64 values of a memory-mapped binary input into blocks.
+# @param data mmap of the input
+# @param fmt 'f64' or 'npy'
+# @param block_size number of bytes of a block
+# @param start offset of the first value
+# @param end offset after the last value, None for all values of the input
+# @return generator of memoryview blocks of numbers
+def _mapped_blocks(data, fmt, block_size, start, end):
+    if end is None:
+        start, end = _binary_range(data, fmt)
+    values = memoryview(data)[start:end].cast('d')
+    step = max(1, block_size // 8)
+    for i in range(0, len(values), step):
+        if sys.byteorder == 'little':
+            yield values[i:i + step]
+        else:
+            block = array('d', values[i:i + step])
+            block.byteswap()
+            yield block
+
+
+## @brief Function to split a file into byte ranges that do not cut numbers.
+# @param path path of the file
+# @param range_size approximate number of bytes of a range
+# @param fmt format of the input, one of FORMATS
+# @return list of tuples (path, start, end, format) with the format of the file detected;
+# end is None for a range covering the whole file
+# @details Every text range but the first starts at a whitespace byte; binary ranges hold
+# whole float64 values.
+def file_ranges(path, range_size, fmt='text'):
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        if not stat.S_ISREG(st.st_mode) or st.st_size <= range_size:
+            return [(path, 0, None, fmt)]
+        size = st.st_size
+        ranges = []
+        start = 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if fmt == 'auto':
+                fmt = detect_format(data[:len(_NPY_MAGIC)], path)
+            if fmt != 'text':
+                start, size = _binary_range(data, fmt)
+                range_size = max(8, range_size - range_size % 8)
+                return [(path, pos, min(pos + range_size, size), fmt)
+                        for pos in range(start, size, range_size)]
+            while size - start > range_size:
+                match = _SPACE_RE.search(data, start + range_size)
+                if match is None:
+                    break
+                ranges.append((path, start, match.start(), fmt))
+                start = match.start()
+        ranges.append((path, start, size, fmt))
+        return ranges
+
+
+## @brief Function to summarize a byte range of a file.
+# @param path path of the file
+# @param start offset of the first byte
+# @param end offset after the last byte, None to read the whole input
+# @param fmt format of the input, one of FORMATS
+# @return tuple (count, mean, M2) of the numbers in the range
+def range_stats(path, start, end, fmt='text'):
+    acc = Accumulator()
+    for block in read_file_blocks(path, BLOCK_SIZE, start, end, fmt):
+        acc.update_block(block)
+    return acc.count, acc.mean, acc.m2
+
+
+## @brief Function to summarize files in parallel.
+# @param paths paths of the files
+# @param workers number of worker processes, by default the number of CPUs
+# @param fmt format of the files, one of FORMATS
+# @return list of tuples (count, mean, M2), one per byte range, to be merged with
+# Accumulator.merge()
+# @details Files are split into byte ranges of at least MIN_RANGE_SIZE bytes, about four per
+# worker, so the workers stay busy when the ranges take different times. With one worker, or
+# a single range, the files are summarized in the calling process.
+def file_stats(paths, workers=None, fmt='text'):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    total = sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+    range_size = max(MIN_RANGE_SIZE, total // (4 * workers))
+    ranges = [r for path in paths for r in file_ranges(path, range_size, fmt)]
+    workers = min(workers, len(ranges))
+    if workers <= 1:
+        return [range_stats(*r) for r in ranges]
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(range_stats, *zip(*ranges)))
+
+
+## @brief Function to expand file names and glob patterns.
+# @param patterns file names or glob patterns
+# @return list of paths; a pattern matching no file is kept as it is
+def expand_paths(patterns):
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return paths
+
+
+## @brief Function to parse the tokens of a block into numbers.
+# @param tokens list of bytes, each a number
+# @return array('d') of the numbers
+# @details Tokens may still hold non-ASCII whitespace, which bytes.split() does not split on;
+# such blocks are decoded and split again like text. Exits with status 1 on invalid input.
+def _parse(tokens):
+    try:
+        return array('d', map(float, tokens))
+    except ValueError:
+        pass
+    try:
+        return array('d', map(float, b' '.join(tokens).decode().split()))
+    except ValueError:
+        _invalid_input()
+
+
+## @brief Function to report invalid input.
+# @details Exits with status 1.
+def _invalid_input():
+    print("Invalid input.", file=sys.stderr)
+    sys.exit(1)
+
 
 ## @brief Function to load data from standard input.
-# @details This function reads lines from standard input, splits them into individual numbers,
+# @details This function reads standard input in blocks, splits them into individual numbers,
 # converts them to floats, and stores them in a list. It handles invalid input.
 # Stops reading when EOF is reached.
 # @return list of floats
 def load_data():
-    ## @var data 
-    # list for storing input
     data = []
-    for line in sys.stdin: # sys.stdin checks for EOF (input() does not)
-        line = line.strip() # remove leading and trailing whitespace
-
-        line = line.split() # split by whitespaces
-
-        try:
-            line = [float(x) for x in line] # convert string to float
-        except ValueError:
-            print("Invalid input.", file=sys.stderr) 
-            sys.exit(1)
-
-        data.extend(line)
-
+    for block in read_blocks(sys.stdin.buffer):
+        data.extend(block)
     return data
 
 
-## @brief Function to calculate the standard deviation of a list of numbers.
-# @param data list of numbers
+## @brief Function to calculate the standard deviation of a series of numbers.
+# @param data iterable of numbers, consumed in a single pass
 # @return standard deviation of data
+# @details Exits with status 1 if there are no numbers.
 def calculate_stddev(data):
-    ## @var N 
-    # number of elements in data
-    N = len(data)
+    acc = Accumulator()
+    acc.update(data)
+    return _stddev(acc)
 
-    if N == 0:
-        print("No data provided.", file=sys.stderr) 
+
+## @brief Function to get the standard deviation from an accumulator.
+# @param acc Accumulator
+# @return standard deviation of the accumulated numbers
+# @details Exits with status 1 if there are no numbers.
+def _stddev(acc):
+    if acc.count == 0:
+        print("No data provided.", file=sys.stderr)
         sys.exit(1)
 
-    mean = math.sum(data) / N
+    return acc.stddev()
+
 
-    sum_of_squares = math.sum(math.square(x) for x in data) # calculate sum of squares
+## @brief Main entry point of the program.
+# @param argv command line arguments, by default sys.argv[1:]
+# @details Streams the numbers from the files, or from stdin if no file is given, into the
+# accumulator block by block and prints the result. With the format 'auto', every input is
+# read as .npy if it starts with the .npy magic string, as raw float64 values if it is a file
+# with one of RAW_EXTENSIONS, and as text otherwise.
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Calculate the standard deviation of whitespace-separated numbers.")
+    parser.add_argument('--file', nargs='+', action='extend', default=[], metavar='PATH',
+                        help="files or glob patterns to read instead of stdin")
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help="number of worker processes summarizing the files (default 1)")
+    parser.add_argument('--format', choices=FORMATS, default='auto',
+                        help="input format: whitespace-separated text, raw little-endian float64 "
+                             "or .npy float64 array (default: .npy by content, raw for .f64 "
+                             "files, text otherwise)")
+    args = parser.parse_args(argv)
 
-    s = math.sqrt((sum_of_squares - N * math.square(mean)) / (N - 1)) # calculate standard deviation
+    acc = Accumulator()
+    if not args.file:
+        for block in read_stream_blocks(sys.stdin.buffer, args.format):
+            acc.update_block(block)
+    paths = expand_paths(args.file)
+    try:
+        if args.workers > 1 and paths:
+            for stats in file_stats(paths, args.workers, args.format):
+                acc.merge(*stats)
+        else:
+            for path in paths:
+                for block in read_file_blocks(path, fmt=args.format):
+                    acc.update_block(block)
+    except OSError as e:
+        print(f"Cannot read {e.filename}: {e.strerror}.", file=sys.stderr)
+        sys.exit(1)
+    print(_stddev(acc))
 
-    return s
 
+if __name__ == "__main__":
+    main()
 
-# --main--
-data = load_data() # load data from stdin
-stddev = calculate_stddev(data) # calculate standard deviation
-print(stddev) # print result
-    
-# end of stddev.py
\ No newline at end of file
+# end of stddev.py
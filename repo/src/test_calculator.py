@@ -0,0 +1,234 @@
+import io
+import time
+import pytest
+import calculator  # Importing the calculator to be tested
+
+## @brief Test evaluation of basic expressions
+## @details Covers operator precedence, associativity, unary minus and errors
+def test_evaluate_basic():
+    assert calculator.evaluate("2*3+4") == "10"
+    assert calculator.evaluate("2^3^2") == "512"
+    assert calculator.evaluate("-2^2") == "4"
+    assert calculator.evaluate("2^-3") == "0.125"
+    assert calculator.evaluate("10/4") == "2.5"
+    assert calculator.evaluate("10/0") == "Error"
+    assert calculator.evaluate("2(3)") == "Error"
+    assert calculator.evaluate("1+") == "Error"
+    assert calculator.evaluate("foo(1)") == "Error"
+
+## @brief Test functions, constants and decimal commas
+## @details Argument commas of log and nthroot are kept, other commas between digits are decimal
+def test_evaluate_functions():
+    assert calculator.evaluate("sin(30)") == "0.5"
+    assert calculator.evaluate("tg(90)") == "Error"
+    assert calculator.evaluate("log(8,2)") == "3"
+    assert calculator.evaluate("n√(8,3)") == "2"
+    assert calculator.evaluate("nthroot(log(8,2),3)") == "1.4422495703"
+    assert calculator.evaluate("2,5*2") == "5"
+    assert calculator.evaluate("abs(-2,5)") == "2.5"
+    assert calculator.evaluate("fact(2,5)") == "Error"
+    assert calculator.evaluate("π") == "3.1415926536"
+    assert calculator.evaluate("ANS+1") == "1"
+
+## @brief Test binary and octal bases
+## @details Literals are read in the base, division returns quotient and remainder
+def test_evaluate_bases():
+    assert calculator.evaluate("101+1", 2) == "110"
+    assert calculator.evaluate("7/2", 2) == "11 zv.1"
+    assert calculator.evaluate("17+1", 8) == "20"
+    assert calculator.evaluate("17/3", 8) == "5 zv.0"
+
+## @brief Test the arbitrary-precision backend
+## @details Results are rounded to the requested number of significant digits
+def test_evaluate_digits():
+    assert calculator.evaluate("π", digits=30) == "3.14159265358979323846264338328"
+    assert calculator.evaluate("1/3", digits=20) == "0.33333333333333333333"
+    assert calculator.evaluate("0,1+0,2", digits=20) == "0.3"
+    assert calculator.evaluate("fact(25)", digits=20) == "15511210043330985984000000"
+    assert calculator.evaluate("fact(5)/fact(3)", digits=30) == "20"
+    assert calculator.evaluate("fact(200)/fact(198)", digits=20) == "39800"
+    assert calculator.evaluate("tg(90)", digits=20) == "Error"
+    assert calculator.evaluate("101+1", 2, digits=20) == "110"
+    assert len(calculator.evaluate("e", digits=1000)) == 1001
+
+## @brief Test the lexer on decimal commas, argument commas and base literals
+## @details A comma between digits is decimal unless it separates two simple arguments
+def test_tokenize():
+    assert calculator.tokenize("2,5*3") == [('NUMBER', 2.5), ('OP', '*'), ('NUMBER', 3)]
+    assert calculator.tokenize("log(8,2)") == [('NAME', 'log'), ('OP', '('), ('NUMBER', 8),
+                                                ('OP', ','), ('NUMBER', 2), ('OP', ')')]
+    assert [tok[1] for tok in calculator.tokenize("n√(2,5, 3)")] == \
+        ['nthroot', '(', 2.5, ',', 3, ')']
+    assert calculator.tokenize("101,1+12", base=2) == [('NUMBER', 5.1), ('OP', '+'),
+                                                       ('NUMBER', 12)]
+    assert calculator.tokenize("17", base=8) == [('NUMBER', 15)]
+    with pytest.raises(SyntaxError):
+        calculator.tokenize("1,5,3")
+    with pytest.raises(SyntaxError):
+        calculator.tokenize("2 # 3")
+
+## @brief Test deeply nested expressions
+## @details Nesting is not limited by the recursion limit
+def test_evaluate_deep():
+    assert calculator.evaluate("(" * 10000 + "1" + ")" * 10000) == "1"
+    assert calculator.evaluate("-" * 10001 + "2") == "-2"
+    assert calculator.evaluate("abs(" * 10000 + "-3" + ")" * 10000) == "3"
+    assert calculator.evaluate("1+" * 10000 + "1") == "10001"
+    assert calculator.evaluate("(" * 10000 + "1") == "Error"
+
+## @brief Test the cache of parsed expressions
+## @details Repeated expressions are parsed once per base, invalid ones are cached too
+def test_parse_cache():
+    calculator.clear_parse_cache()
+    assert calculator.evaluate("1+2") == "3"
+    assert calculator.evaluate("1+2") == "3"
+    assert calculator.evaluate("1+2", 2) == "11"
+    assert calculator.evaluate("1+") == "Error"
+    assert calculator.evaluate("1+") == "Error"
+    info = calculator.parse_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (2, 3, 3)
+    calculator.set_parse_cache_size(2)
+    for expr in ("1", "2", "3"):
+        calculator.evaluate(expr)
+    assert calculator.parse_cache_info().currsize == 2
+    calculator.set_parse_cache_size(calculator.PARSE_CACHE_SIZE)
+
+## @brief Test compiled expressions against the AST interpreter
+## @details Both evaluation strategies must agree, and long expressions must not recurse
+def test_compile_ast():
+    ns = calculator.build_safe_ns(0)
+    for expr in ("1+2*3-4/5", "-2^2", "2^-3^2", "sin(30)*cos(60)+log(8,2)", "pi()+compute_e()",
+                 "nthroot(27,3)-fact(5)", "---4", "abs(-(2-5))*√(16)"):
+        ast = calculator.Parser(list(calculator.tokenize(expr)) + [('EOF', '')]).parse()
+        assert calculator.compile_ast(ast, ns)() == calculator.eval_node(ast, ns)
+    assert calculator.evaluate("+".join(["1"] * 5000)) == "5000"
+
+## @brief Test constant folding and common-subexpression elimination
+## @details Constant sub-trees become numbers, failing ones stay and shared ones are computed once
+def test_optimize():
+    ns = calculator.build_safe_ns(0)
+
+    def parse(expr):
+        return calculator.Parser(list(calculator.tokenize(expr)) + [('EOF', '')]).parse()
+
+    assert calculator.optimize(parse("2*3+fact(3)"), ns) == ('number', 12)
+    folded = calculator.optimize(parse("(1/0+2)*(1/0+2)"), ns)
+    assert folded[0] == 'binop' and folded[2] is folded[3]
+    assert calculator.optimize(parse("log(-1,10)+1"), ns)[0] == 'binop'
+    assert calculator.evaluate("(1/0+2)*(1/0+2)") == "Error"
+    assert calculator.evaluate("sin(30)*sin(30)+cos(30)*cos(30)") == "1.0"
+
+    def failing(n):
+        raise ValueError
+
+    calls = []
+    tree = calculator.optimize(parse("fact(4)*2+fact(4)*2"), dict(ns, fact=failing))
+    counting_ns = dict(ns, fact=lambda n: calls.append(n) or 24)
+    assert calculator.compile_ast(tree, counting_ns)() == 96
+    assert calls == [4]
+
+## @brief Test expressions with free variables compiled once
+## @details Values are bound positionally or by name, errors follow math_lib
+def test_compile_expression():
+    f = calculator.compile_expression("x^2 + sin(y)*2", ("x", "y"))
+    assert f(3, 30) == f(x=3, y=30) == f(3, y=30) == 10
+    g = calculator.compile_expression("1/x + ln(x)", ["x"])
+    assert g(0) == "Error"
+    assert g(-1) == "Error"
+    assert g(1) == 1
+    assert calculator.compile_expression("2*π", ()).ast[0] == 'number'
+    for bad in (("sin+1", ["sin"]), ("e+1", ["e"]), ("y+1", ["x"])):
+        with pytest.raises(SyntaxError):
+            calculator.compile_expression(*bad)
+    with pytest.raises(TypeError):
+        f(1)
+
+## @brief Test vectorized evaluation of compiled expressions
+## @details Arrays are evaluated element-wise and match the scalar evaluation
+def test_compile_expression_vector():
+    np = pytest.importorskip("numpy")
+    f = calculator.compile_expression("1/x + ln(x)*cos(x) - x^0,5", ["x"])
+    xs = np.array([-2.0, 0.0, 0.5, 1.0, 7.0, 1234.5])
+    result = f(xs)
+    for x, got in zip(xs.tolist(), result):
+        expected = f(x)
+        if expected == "Error":
+            assert np.isnan(got)
+        else:
+            assert abs(got - expected) <= 1e-12 * max(1, abs(expected))
+    assert f(x=xs).shape == xs.shape
+    assert calculator.compile_expression("x*0+2", ["x"])(np.zeros(3)).tolist() == [2, 2, 2]
+
+## @brief Test parallel evaluation of a batch of expressions
+## @details Results keep the input order and invalid expressions give "Error"
+def test_evaluate_many():
+    exprs = ["1+2", "fact(10)", "1/0", "2^10", "sin(90)", "1+", "101+1"] * 5
+    expected = [calculator.evaluate(expr) for expr in exprs]
+    assert calculator.evaluate_many(exprs, workers=1) == expected
+    assert calculator.evaluate_many(exprs, workers=2, chunksize=3) == expected
+    assert calculator.evaluate_many(iter(exprs), base=2, workers=2) == \
+        [calculator.evaluate(expr, 2) for expr in exprs]
+    assert calculator.evaluate_many([]) == []
+
+## @brief Test the headless command line interface
+## @details Expressions are read line by line and empty lines stay aligned
+def test_main_stdin(monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', io.StringIO("1+2\n\n101+1\n1/0\n"))
+    assert calculator.main(["--stdin", "--base", "2"]) == 0
+    assert capsys.readouterr().out == "11\n\n110\nError\n"
+    assert calculator.main(["log(8,2)", "--digits=5", "π"]) == 0
+    assert capsys.readouterr().out == "3\n3.1416\n"
+    assert calculator.main(["--base", "3"]) == 2
+    assert "error" in capsys.readouterr().err
+
+## @brief Test evaluation budgets
+## @details Over-budget expressions fail fast with a distinguishable error
+def test_evaluate_budget():
+    budget = calculator.Budget(time=1, max_bits=10000, max_exponent=1000, max_fact=500)
+    for expr in ("9^9^9", "fact(1000000)", "2^(10^8)", "fact(600)", "(2^6000)*(2^6000)"):
+        assert calculator.evaluate(expr, budget=budget) == calculator.BUDGET_ERROR
+    assert calculator.evaluate("π", digits=5000, budget=budget) == calculator.BUDGET_ERROR
+    assert calculator.evaluate("fact(20)*2^10", budget=budget) == "2491291656372879360000"
+    assert calculator.evaluate("1/0", budget=budget) == "Error"
+    assert calculator.evaluate("111/10", 2, budget=budget) == "11 zv.1"
+    assert calculator.evaluate("2^(10^8)") == "Error"
+    assert calculator.evaluate("sin(1)" + "+sin(1)" * 10000,
+                               budget=calculator.Budget(time=0)) == calculator.BUDGET_ERROR
+    start = time.monotonic()
+    assert calculator.evaluate("9^9^8", budget=calculator.Budget(time=0.05)) == calculator.BUDGET_ERROR
+    assert calculator.evaluate("(3^300000)*(3^300000)", budget=calculator.Budget(time=0.05)) \
+        == calculator.BUDGET_ERROR
+    assert time.monotonic() - start < 1
+    assert calculator.evaluate("2^1000", budget=calculator.Budget(time=0.05)) == str(2 ** 1000)
+
+## @brief Test calculator sessions
+## @details ANS keeps full precision, sessions are independent and results are memoized
+def test_calculator_session():
+    session = calculator.CalculatorSession()
+    other = calculator.CalculatorSession(base=2)
+    assert session.evaluate("ANS+1") == "1"
+    assert session.evaluate("1/3") == "0.3333333333"
+    assert session.evaluate("ANS*3") == "1"
+    assert session.evaluate("ANS[1]+ANS[2]") == "1.3333333333"
+    assert session.evaluate("ANS[99]") == "0"
+    assert session.evaluate("1/0") == "Error"
+    assert session.evaluate("ANS[") == "Error"
+    assert session.ans() == 0 and session.ans(3) == 1/3
+    assert other.evaluate("111/10") == "11 zv.1"
+    assert other.evaluate("ANS+1") == "100"
+    assert session.ans(3) == 1/3 and other.ans() == 4
+    session.evaluate("sin(30)*2^10")
+    results = len(session._results)
+    assert session.evaluate("sin( 30 ) * 2**10") == "512"
+    assert len(session._results) == results
+    session.clear()
+    assert session.evaluate("ANS") == "0" and len(session.history) == 1
+    bounded = calculator.CalculatorSession(memo_size=50)
+    for _ in range(5000):
+        bounded.evaluate("ANS+1")
+    assert bounded.ans() == 5000 and len(bounded._results) <= 50
+    precise = calculator.CalculatorSession(digits=20)
+    assert precise.evaluate("1/3") == "0.33333333333333333333"
+    assert precise.evaluate("ANS*3") == "1.0"
+    assert precise.evaluate("ANS[1]*6") == "2"
+    assert precise.evaluate("ANS[0.5]") == "Error"
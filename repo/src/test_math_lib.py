@@ -1,4 +1,5 @@
 import math  # Importing standard math module for comparison
+import pytest
 import math_lib  # Importing the custom math library to be tested
 
 ## @brief Test addition functionality from math_lib
@@ -35,6 +36,13 @@ def test_fact():
     assert math_lib.fact(0) == 1
     assert math_lib.fact(5) == 120
     assert math_lib.fact(-3) == "Error"
+    assert math_lib.fact(2.5) == "Error"
+    assert math_lib.fact(-2.0) == "Error"
+    assert math_lib.fact(6.0) == 720.0
+    assert math_lib.fact(170.0) == float(math.factorial(170))
+    assert math_lib.fact(171.0) == math_lib.fact(300000.0) == math.inf
+    for n in (255, 256, 257, 1000, 5000):
+        assert math_lib.fact(n) == math.factorial(n)
 
 ## @brief Test Euler's number approximation
 ## @details Compares custom approximation with Python’s math.e constant
@@ -50,12 +58,24 @@ def test_arctan_and_pi():
     pi_approx = math_lib.pi()
     assert math.isclose(pi_approx, math.pi, rel_tol=1e-10)
 
+## @brief Test the constant cache
+## @details Repeated calls are served from the cache and differing precisions are kept apart
+def test_constant_cache():
+    assert math_lib.pi() is math_lib.pi()
+    assert math_lib.compute_e(precision=20) is math_lib.compute_e(precision=20)
+    assert math_lib.compute_e(precision=3) == 2.5
+    assert math.isclose(math_lib.compute_e(precision=20), math.e, rel_tol=1e-15)
+
 ## @brief Test squaring and exponentiation
 ## @details Verifies squaring a number and raising to various powers
 def test_square_and_power():
     assert math_lib.square(5) == 25
     assert math_lib.power(2, 3) == 8
     assert math_lib.power(5, 0) == 1
+    assert math_lib.power(3, 100.0) == 3**100
+    assert math_lib.power(3, -2.0) == 1/9
+    with pytest.raises(OverflowError):
+        math_lib.power(3, 1e10)
 
 ## @brief Test square root functionality
 ## @details Checks for perfect square, irrational square root and negative number handling
@@ -63,6 +83,9 @@ def test_sqrt():
     assert math_lib.sqrt(4) == 2
     assert math_lib.sqrt(2) == round(math.sqrt(2), 10)
     assert math_lib.sqrt(-1) == "Error"
+    assert math_lib.sqrt(10**400) == 10**200
+    assert math_lib.sqrt((3**300 + 1)**2) == 3**300 + 1
+    assert math.isclose(math_lib.sqrt(10**401), math.sqrt(10) * 1e200, rel_tol=1e-15)
 
 ## @brief Test n-th root computation
 ## @details Tests for positive/negative inputs, even/odd roots, and invalid inputs
@@ -72,6 +95,17 @@ def test_nthroot():
     assert math_lib.nthroot(-8, 3) == -2
     assert math_lib.nthroot(-16, 4).startswith("Error")
     assert math_lib.nthroot(8, 0).startswith("Error")
+    assert math_lib.nthroot(7**900, 300) == 343
+    assert math_lib.nthroot(-(12345**7), 7) == -12345
+    assert math_lib.nthroot(7**900, 300.0) == 343
+    assert math.isclose(math_lib.nthroot(10**400 + 1, 100), 10000.0, rel_tol=1e-15)
+    assert math.isclose(math_lib.nthroot(-(10**400) - 1, 101), -(10**(400 / 101)), rel_tol=1e-13)
+    assert math.isclose(math_lib.nthroot(2**2000 + 1, 1000), 4.0, rel_tol=1e-15)
+    assert math.isclose(math_lib.nthroot(10**400 + 1, 3.0), 10**(400 / 3), rel_tol=1e-13)
+    assert math.isclose(math_lib.nthroot(3**1000, 7), 3**(1000 / 7), rel_tol=1e-13)
+    for n in range(2, 40):
+        a = 987654321**n + 1
+        assert math_lib._iroot(a, n) == 987654321
 
 ## @brief Test natural logarithm and logarithm with custom base
 ## @details Includes valid and invalid input handling for ln and log
@@ -82,6 +116,14 @@ def test_ln_and_log():
     assert math.isclose(math_lib.log(8, 2), 3, rel_tol=1e-10)
     assert math_lib.log(-1, 10) == "Error"
     assert math_lib.log(10, 1) == "Error"
+    assert math.isclose(math_lib.log(1000000, 10), 6, rel_tol=1e-15)
+
+## @brief Test natural logarithm over many magnitudes
+## @details Includes tiny and huge floats and integers beyond the float range
+def test_ln_range():
+    for a in (1e-300, 3e-17, 0.5, 0.7, 1.5, 2, 10, 12345.678, 1e300):
+        assert math.isclose(math_lib.ln(a), math.log(a), rel_tol=1e-14)
+    assert math.isclose(math_lib.ln(10**400), 400 * math.log(10), rel_tol=1e-14)
 
 ## @brief Test absolute value and list summation
 ## @details Tests abs for positive/negative numbers and sum over lists, including empty list
@@ -100,6 +142,50 @@ def test_sin_cos_tg_cotg():
     assert math.isclose(math_lib.cotg(45), 1, rel_tol=1e-10)
     assert math_lib.tg(90) == "Error"
     assert math_lib.cotg(0) == "Error"
+    assert math.isclose(math_lib.tg(135), -1, rel_tol=1e-15)
+    assert math_lib.sincos(90) == (1.0, 0.0)
+
+## @brief Test sine and cosine over a wide range of angles
+## @details Compares against the standard math module, including angles far outside one period
+def test_sincos_range():
+    for deg in range(-1080, 1081, 7):
+        s, c = math_lib.sincos(deg + 0.25)
+        rad = math.radians(deg + 0.25)
+        assert math.isclose(s, math.sin(rad), abs_tol=1e-14)
+        assert math.isclose(c, math.cos(rad), abs_tol=1e-14)
+
+## @brief Test the instrumentation of the series-based functions
+## @details Calls, iteration counts and time are recorded only while it is enabled; iterations
+## of uninstrumented calls are not charged to the next instrumented one
+def test_stats():
+    plain_ln = math_lib.ln
+    assert math_lib.get_stats() is None
+    math_lib.enable_stats()
+    try:
+        math_lib.ln(10)
+        math_lib.ln(1e300)
+        math_lib.sin(30)
+        stats = math_lib.get_stats()
+        assert stats['ln']['calls'] == 2
+        assert sum(stats['ln']['iterations'].values()) == 2
+        assert max(stats['ln']['iterations']) < 20
+        assert stats['sin']['iterations'] == {len(math_lib._SIN_COEFFS): 1}
+        assert stats['ln']['total_time'] > 0
+        math_lib.reset_stats()
+        for _ in range(5):
+            math_lib.tg(30)
+        plain_ln(10)
+        math_lib.sin(30)
+        stats = math_lib.get_stats()
+        assert stats['tg']['iterations'] == {len(math_lib._SIN_COEFFS): 5}
+        assert stats['sin']['iterations'] == {len(math_lib._SIN_COEFFS): 1}
+        assert stats['sincos']['calls'] == 6 and 'ln' not in stats
+        math_lib.reset_stats()
+        assert math_lib.get_stats() == {}
+    finally:
+        math_lib.disable_stats()
+    assert math_lib.ln is plain_ln
+    assert math_lib.get_stats() is None
 
 ## @brief Final test result output
 ## @details Printed if all assertions above pass successfully
@@ -0,0 +1,51 @@
+import decimal
+import math  # Importing standard math module for comparison
+from decimal import Decimal
+import math_lib_decimal  # Importing the arbitrary-precision library to be tested
+
+PI_60 = "3.14159265358979323846264338327950288419716939937510582097494"
+E_60 = "2.71828182845904523536028747135266249775724709369995957496697"
+
+## @brief Test pi and e at several precisions
+## @details Compares against known digits and checks that the cache keeps precisions apart
+def test_constants():
+    for prec in (10, 30, 50):
+        with decimal.localcontext() as ctx:
+            ctx.prec = prec
+            assert math_lib_decimal.pi() == +Decimal(PI_60)
+            assert math_lib_decimal.compute_e() == +Decimal(E_60)
+    with decimal.localcontext() as ctx:
+        ctx.prec = 1000
+        assert len(str(math_lib_decimal.pi())) == 1001
+
+## @brief Test series-based functions against the float library
+## @details Results rounded to float precision must agree with the standard math module
+def test_functions():
+    with decimal.localcontext() as ctx:
+        ctx.prec = 60
+        for x in (Decimal('0.001'), Decimal('0.5'), Decimal(3), Decimal(1000)):
+            assert math.isclose(math_lib_decimal.arctan(x), math.atan(x), rel_tol=1e-15)
+        for x in (Decimal('1e-300'), Decimal('0.5'), Decimal(2), Decimal('1e300')):
+            assert math.isclose(math_lib_decimal.ln(x), math.log(x), rel_tol=1e-15)
+        for deg in (-1000, -45, 1, 30, 89, 135, 1234):
+            s, c = math_lib_decimal.sincos(Decimal(deg) + Decimal('0.5'))
+            assert math.isclose(s, math.sin(math.radians(deg + 0.5)), abs_tol=1e-15)
+            assert math.isclose(c, math.cos(math.radians(deg + 0.5)), abs_tol=1e-15)
+        assert math_lib_decimal.sincos(180) == (0, -1)
+        assert math_lib_decimal.ln(Decimal(2)) * 2 - math_lib_decimal.ln(Decimal(4)) == 0
+
+## @brief Test exact results and error values
+## @details Error cases mirror math_lib
+def test_exact_and_errors():
+    assert math_lib_decimal.nthroot(Decimal(27), 3) == 3
+    assert math_lib_decimal.nthroot(Decimal(-8), 3) == -2
+    assert math_lib_decimal.nthroot(Decimal(-16), 4).startswith("Error")
+    assert math_lib_decimal.sqrt(Decimal(16)) == 4
+    assert math_lib_decimal.sqrt(-1) == "Error"
+    assert math_lib_decimal.fact(Decimal(25)) == math.factorial(25)
+    assert isinstance(math_lib_decimal.fact(5), Decimal)
+    assert math_lib_decimal.fact(Decimal('2.5')) == "Error"
+    assert math_lib_decimal.log(Decimal(1024), 2) == 10
+    assert math_lib_decimal.ln(0) == "Error"
+    assert math_lib_decimal.tg(90) == "Error"
+    assert math_lib_decimal.cotg(0) == "Error"
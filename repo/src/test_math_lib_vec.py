@@ -0,0 +1,53 @@
+import math  # Importing standard math module for comparison
+import pytest
+np = pytest.importorskip("numpy")
+import math_lib  # Importing the custom math library to be tested
+
+vec = math_lib.vec
+
+## @brief Compare a vectorized result with the scalar function element by element
+## @details Elements where the scalar function returns an error must be NaN
+def check(vec_result, scalar, *args):
+    for i, expected in enumerate(scalar(*(a[i] for a in args))
+                                 for i in range(len(args[0]))):
+        got = vec_result[i]
+        if isinstance(expected, str):
+            assert np.isnan(got)
+        else:
+            assert math.isclose(got, expected, rel_tol=vec.TOLERANCE, abs_tol=vec.TOLERANCE)
+
+## @brief Test arithmetic and division by zero
+## @details Division by zero yields NaN instead of "Error"
+def test_arithmetic():
+    a = np.array([1.0, -2.5, 7.0, 0.0])
+    b = np.array([2.0, 0.5, 0.0, 3.0])
+    check(vec.add(a, b), math_lib.add, a, b)
+    check(vec.mul(a, b), math_lib.mul, a, b)
+    check(vec.div(a, b), math_lib.div, a, b)
+    assert vec.is_error(vec.div(a, b)).tolist() == [False, False, True, False]
+
+## @brief Test factorial, roots and powers
+## @details Includes the error cases of the scalar functions
+def test_fact_roots_power():
+    n = np.array([0, 5, 20, -1, 2.5])
+    check(vec.fact(n), math_lib.fact, n)
+    a = np.array([4.0, 2.0, -1.0, 27.0, 16.0, -8.0, 8.0])
+    r = np.array([2.0, 3.0, 3.0, 3.0, 4.0, 3.0, 0.0])
+    check(vec.sqrt(a), math_lib.sqrt, a)
+    check(vec.nthroot(a, r), math_lib.nthroot, a, r)
+    check(vec.power(a, r), math_lib.power, a, r)
+
+## @brief Test logarithms
+## @details Covers tiny and huge inputs and invalid arguments
+def test_ln_log():
+    a = np.array([1e-300, 0.5, 1.0, 2.0, 10.0, 1e300, 0.0, -3.0])
+    b = np.array([2.0, 10.0, 3.0, 1.0, 10.0, 0.5, 2.0, 2.0])
+    check(vec.ln(a), math_lib.ln, a)
+    check(vec.log(a, b), math_lib.log, a, b)
+
+## @brief Test trigonometric functions
+## @details Covers many periods and the undefined values of tg and cotg
+def test_trig():
+    x = np.arange(-1080.0, 1081.0, 7.5)
+    for name in ('sin', 'cos', 'tg', 'cotg'):
+        check(getattr(vec, name)(x), getattr(math_lib, name), x)
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import server  # Importing the server to be tested
+
+## @brief Function to run a coroutine against a server listening on a free TCP port
+# @param test coroutine function taking a reader, a writer and the server
+# @param kwargs arguments of CalculatorServer
+def run_with_server(test, **kwargs):
+    async def main():
+        calc = server.CalculatorServer(**kwargs)
+        ready = asyncio.get_running_loop().create_future()
+        serving = asyncio.create_task(calc.serve(port=0, ready=ready.set_result))
+        listener = await ready
+        reader, writer = await asyncio.open_connection(*listener.sockets[0].getsockname()[:2])
+        try:
+            await test(reader, writer, calc)
+        finally:
+            writer.close()
+            serving.cancel()
+            await asyncio.gather(serving, return_exceptions=True)
+    asyncio.run(main())
+
+## @brief Function to send requests and collect the responses by id
+async def exchange(reader, writer, requests):
+    writer.write("".join(json.dumps(request) + "\n" for request in requests).encode())
+    await writer.drain()
+    responses = {}
+    for _ in requests:
+        response = json.loads(await reader.readline())
+        responses[response['id']] = response
+    return responses
+
+## @brief Test evaluation over the line-delimited JSON protocol
+## @details Requests sent together are batched and answered with their ids
+def test_server_evaluate():
+    async def test(reader, writer, calc):
+        responses = await exchange(reader, writer, [
+            {'id': 1, 'expr': "1+2"},
+            {'id': 2, 'expr': "101+1", 'base': 2},
+            {'id': 3, 'expr': "1/0"},
+            {'id': 4, 'expr': "π", 'digits': 20},
+            {'id': 5, 'expr': "1+2", 'base': 3},
+            {'id': 6, 'op': 'stats'},
+            {'id': 8, 'expr': "1", 'timeout': "x"},
+            {'id': 9, 'expr': "1", 'timeout': 0},
+        ])
+        assert responses[1]['result'] == "3"
+        assert responses[2]['result'] == "110"
+        assert responses[3]['result'] == "Error"
+        assert responses[4]['result'] == "3.1415926535897932385"
+        assert "base" in responses[5]['error']
+        assert "timeout" in responses[8]['error'] and "timeout" in responses[9]['error']
+        stats = (await exchange(reader, writer, [{'id': 7, 'op': 'stats'}]))[7]['stats']
+        assert stats['requests'] == 4 and stats['queue_depth'] == 0
+        assert stats['batches'] < 4 and stats['latency_ms']['max'] > 0
+    run_with_server(test, workers=1, batch_delay=0.05)
+
+## @brief Test per-request timeouts
+## @details A runaway request times out, the workers are restarted and keep serving
+def test_server_timeout():
+    async def test(reader, writer, calc):
+        responses = await exchange(reader, writer, [{'id': 1, 'expr': "sin(1)",
+                                                     'digits': 20000, 'timeout': 0.2}])
+        assert responses[1]['error'] == "timeout"
+        responses = await exchange(reader, writer, [{'id': 2, 'expr': "2*3"}])
+        assert responses[2]['result'] == "6"
+        stats = calc.stats()
+        assert stats['timeouts'] == 1 and stats['worker_restarts'] == 1
+    run_with_server(test, workers=1)
+
+## @brief Test a runaway request batched with fast ones
+## @details The fast requests are answered before the runaway one times out, or sent again
+## after the workers are restarted, within their own timeouts
+def test_server_timeout_batch():
+    async def test(reader, writer, calc):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        responses = await exchange(reader, writer, [{'id': 1, 'expr': "sin(1)", 'digits': 20000,
+                                                     'timeout': 0.5},
+                                                    {'id': 2, 'expr': "1+2", 'timeout': 5},
+                                                    {'id': 3, 'expr': "2*3", 'timeout': 5}])
+        assert responses[1]['error'] == "timeout"
+        assert responses[2]['result'] == "3" and responses[3]['result'] == "6"
+        assert loop.time() - start < 2
+        assert calc.stats()['batches'] == 1
+    run_with_server(test, workers=1, batch_delay=0.05)
+
+## @brief Test the budget of the server
+## @details Over-budget requests are rejected without occupying the workers
+def test_server_budget():
+    async def test(reader, writer, calc):
+        responses = await exchange(reader, writer, [{'id': 1, 'expr': "9^9^9"},
+                                                    {'id': 2, 'expr': "fact(100)"}])
+        assert responses[1]['result'] == responses[2]['result'] == "Error: budget exceeded"
+        assert calc.stats()['worker_restarts'] == 0
+    run_with_server(test, workers=1, budget=server.calculator.Budget(max_bits=100))
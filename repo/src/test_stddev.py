@@ -0,0 +1,133 @@
+import io
+import statistics
+import sys
+from array import array  # Importing standard statistics module for comparison
+import pytest
+import stddev  # Importing the program to be tested
+
+## @brief Function to create a standard input stream
+# @param data bytes of the input
+# @return text stream with a binary buffer, like sys.stdin
+def stdin(data):
+    return io.TextIOWrapper(io.BytesIO(data))
+
+## @brief Test the standard deviation of numbers read from a stream
+## @details Numbers may be split over lines and separated by any whitespace
+def test_stddev_stream(monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', stdin(b"1 2 3\n4\t5 6\n\n-7 -1\n"))
+    stddev.main([])
+    assert capsys.readouterr().out == "4.1382363393\n"
+
+## @brief Test reading numbers in blocks
+## @details Numbers cut by block boundaries are joined, non-ASCII whitespace separates numbers
+def test_read_blocks():
+    data = " ".join(str(x / 7) for x in range(-500, 500)).encode() + "\u2003\n1e3".encode()
+    for block_size in (1, 7, 64, stddev.BLOCK_SIZE):
+        numbers = [x for block in stddev.read_blocks(io.BytesIO(data), block_size) for x in block]
+        assert numbers == [x / 7 for x in range(-500, 500)] + [1000.0]
+    acc = stddev.Accumulator()
+    for block in stddev.read_blocks(io.BytesIO(data), 64):
+        acc.update_block(block)
+    assert acc.stddev() == stddev.calculate_stddev(x / 7 for x in [*range(-500, 500), 7000])
+
+## @brief Test numerical stability with a large offset
+## @details The naive sum of squares formula loses all digits here; blocks are summarized
+## with and without NumPy
+@pytest.mark.parametrize("numpy", [True, False])
+def test_stddev_offset(monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(stddev, '_np', False)
+    data = [1e9 + x / 10 for x in range(1000)]
+    assert stddev.calculate_stddev(iter(data)) == pytest.approx(statistics.stdev(data), rel=1e-6)
+    acc = stddev.Accumulator()
+    acc.update_block(data)
+    acc.update_block(array('d', data))
+    assert acc.count == 2000
+    assert acc.stddev() == pytest.approx(statistics.stdev(data + data), rel=1e-9)
+
+## @brief Test invalid and empty input
+## @details Both exit with status 1 and a message on stderr
+@pytest.mark.parametrize("text, message", [(b"1 2 x\n", "Invalid input."), (b"\n \n", "No data provided."),
+                                           (b"1 2 3 4 5 6 7 8\0", "Invalid input."),
+                                           (b"1 2 3 4\0", "Invalid input.")])
+def test_stddev_errors(monkeypatch, capsys, text, message):
+    monkeypatch.setattr('sys.stdin', stdin(text))
+    with pytest.raises(SystemExit) as exc:
+        stddev.main([])
+    assert exc.value.code == 1
+    assert capsys.readouterr().err == message + "\n"
+
+## @brief Test reading memory-mapped files and glob patterns
+## @details The numbers of all files are combined, empty files are allowed
+def test_stddev_files(tmp_path, capsys):
+    (tmp_path / "a1.txt").write_bytes(b"1 2 3\n4")
+    (tmp_path / "a2.txt").write_bytes(b" 5 6\n-7 -1\n")
+    (tmp_path / "b.txt").write_bytes(b"")
+    stddev.main(["--file", str(tmp_path / "a*.txt"), str(tmp_path / "b.txt")])
+    assert capsys.readouterr().out == "4.1382363393\n"
+    with pytest.raises(SystemExit) as exc:
+        stddev.main(["--file", str(tmp_path / "missing.txt")])
+    assert exc.value.code == 1
+    assert "missing.txt" in capsys.readouterr().err
+
+## @brief Test summarizing byte ranges of files in parallel
+## @details Merged partial results match the serial computation
+def test_stddev_parallel(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(stddev, 'MIN_RANGE_SIZE', 64)
+    numbers = [1e6 + (x * 7919 % 1000) / 3 for x in range(3000)]
+    path = tmp_path / "data.txt"
+    separators = (" ", "\n", "\t ", "  \n")
+    path.write_text("".join(f"{x}{separators[i % 4]}" for i, x in enumerate(numbers)))
+    ranges = stddev.file_ranges(str(path), 1000)
+    assert len(ranges) > 10 and ranges[-1][2] == path.stat().st_size
+    assert all(a[2] == b[1] for a, b in zip(ranges, ranges[1:]))
+    stddev.main(["--file", str(path)])
+    serial = capsys.readouterr().out
+    stddev.main(["--file", str(path), "--workers", "3"])
+    assert capsys.readouterr().out == serial
+    acc = stddev.Accumulator()
+    for stats in stddev.file_stats([str(path)], workers=2):
+        acc.merge(*stats)
+    assert acc.count == len(numbers)
+    assert acc.stddev() == pytest.approx(statistics.stdev(numbers), rel=1e-9)
+
+## @brief Function to create a .npy file of float64 values
+# @param numbers list of numbers
+# @return bytes of the file
+def npy(numbers):
+    header = f"{{'descr': '<f8', 'fortran_order': False, 'shape': ({len(numbers)},), }}"
+    header += " " * (-(len(header) + 11) % 64) + "\n"
+    values = array('d', numbers)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, 'little') + header.encode() + values.tobytes()
+
+## @brief Test raw float64 and .npy input
+## @details Formats are detected per input; truncated binary input is invalid
+def test_stddev_binary(tmp_path, monkeypatch, capsys):
+    numbers = [1e6 + (x * 7919 % 1000) / 3 for x in range(3000)]
+    raw = npy(numbers)[128:]
+    (tmp_path / "data.f64").write_bytes(raw)
+    (tmp_path / "data.npy").write_bytes(npy(numbers))
+    (tmp_path / "data.txt").write_text(" ".join(map(str, numbers)))
+    stddev.main(["--file", str(tmp_path / "data.txt")])
+    text = capsys.readouterr().out
+    for args in (["--file", str(tmp_path / "data.f64")], ["--file", str(tmp_path / "data.npy")],
+                 ["--file", str(tmp_path / "data.f64"), "--format", "f64", "--workers", "2"]):
+        stddev.main(args)
+        assert capsys.readouterr().out == text
+    monkeypatch.setattr(stddev, 'MIN_RANGE_SIZE', 1000)
+    ranges = stddev.file_ranges(str(tmp_path / "data.npy"), 1000, 'auto')
+    assert ranges[0][1:] == (128, 1128, 'npy') and ranges[-1][2] == 128 + len(raw)
+    acc = stddev.Accumulator()
+    for stats in stddev.file_stats([str(tmp_path / "data.npy")], workers=1, fmt='auto'):
+        acc.merge(*stats)
+    assert acc.stddev() == pytest.approx(statistics.stdev(numbers), rel=1e-9)
+    for data, fmt in ((npy(numbers), 'auto'), (raw, 'f64')):
+        monkeypatch.setattr('sys.stdin', stdin(data))
+        stddev.main(["--format", fmt])
+        assert capsys.readouterr().out == text
+    monkeypatch.setattr('sys.stdin', stdin(npy(numbers)[:-1]))
+    with pytest.raises(SystemExit):
+        stddev.main([])
+    assert capsys.readouterr().err == "Invalid input.\n"